@@ -16,6 +16,7 @@ from app.schemas.analytics import (
     DashboardAnalytics, AnalyticsSummary
 )
 from app.api.deps.auth import require_active_user, require_system_admin
+from app.services.log_writer import get_log_writer
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
@@ -23,16 +24,13 @@ router = APIRouter(prefix="/analytics", tags=["Analytics"])
 # ============ ACTIVITY LOGGING ============
 
 def log_activity(db: Session, user_id: int, company_id: int, action: str, details: dict = None):
-    """Helper function to log activity"""
-    log = ActivityLog(
+    """Helper function to log activity (queued for a batched insert)"""
+    get_log_writer().log_activity(
         user_id=user_id,
         company_id=company_id,
         action=action,
-        details=details or {}
+        details=details
     )
-    db.add(log)
-    db.commit()
-    return log
 
 
 @router.get("/activity", response_model=ActivityLogListResponse)
@@ -7,6 +7,7 @@ from app.core.database import get_db
 from app.core.security import verify_password, create_access_token
 from app.core.config import settings
 from app.models.models import SystemAdmin, User, ActivityLog
+from app.services.log_writer import get_log_writer
 from app.schemas.auth import LoginRequest, LoginResponse, SystemAdminResponse, UserResponse
 from app.api.deps.auth import get_current_user, require_active_user
 from typing import Union
@@ -79,13 +80,12 @@ def login(
         user.last_login = datetime.utcnow()
         
         # Log activity
-        activity = ActivityLog(
+        get_log_writer().log_activity(
             user_id=user.id,
             company_id=user.company_id,
             action="User Login",
             details={"email": user.email}
         )
-        db.add(activity)
         db.commit()
         
         return LoginResponse(
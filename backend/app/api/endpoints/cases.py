@@ -6,6 +6,8 @@ from datetime import datetime, timedelta
 
 from app.core.database import get_db
 from app.models.models import CaseTemplate, CaseInstance, User, Document, ActivityLog, SystemAdmin
+from app.services.log_writer import get_log_writer
+from app.services.suggest import get_suggestion_service
 from app.schemas.cases import (
     CaseTemplateCreate, CaseTemplateResponse,
     CaseInstanceCreate, CaseInstanceUpdate, CaseInstanceResponse,
@@ -127,16 +129,15 @@ def create_case(
     db.add(case)
     db.commit()
     db.refresh(case)
+    get_suggestion_service().upsert(case.company_id, "case", case.id, data.title)
     
     # Log activity
-    activity = ActivityLog(
+    get_log_writer().log_activity(
         user_id=current_user.id,
         company_id=current_user.company_id,
         action="Case Study Created",
         details={"case_id": case.id, "title": data.title, "template_id": data.template_id}
     )
-    db.add(activity)
-    db.commit()
     
     # Get creator name
     creator = db.query(User).filter(User.id == case.created_by).first()
@@ -301,6 +302,8 @@ def update_case(
     case.data_json = updated_json
     db.commit()
     db.refresh(case)
+    if data.title:
+        get_suggestion_service().upsert(case.company_id, "case", case.id, data.title)
     
     template = db.query(CaseTemplate).filter(CaseTemplate.id == case.template_id).first()
     creator = db.query(User).filter(User.id == case.created_by).first()
@@ -335,6 +338,7 @@ def delete_case(
     
     db.delete(case)
     db.commit()
+    get_suggestion_service().remove(case.company_id, "case", case_id)
     return {"message": "Case deleted"}
 
 
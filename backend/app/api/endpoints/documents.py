@@ -1,24 +1,29 @@
 from app.models.models import SystemAdmin
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func, or_
 from typing import Optional, List
 from app.core.database import get_db
 from app.core.config import settings
-from app.models.models import Document, User, ActivityLog
+from app.models.models import Document, DocumentChunk, User, ActivityLog
 from app.schemas.documents import DocumentResponse, DocumentListResponse, DocumentStats
 from app.api.deps.auth import require_active_user
 from app.utils.storage import get_file_storage, validate_file_type, format_file_size
 from datetime import datetime
-from app.services.document_processor import get_document_processor
+from app.services.job_queue import enqueue_documents
+from app.services.document_cache import get_document_cache
+from app.services.index_generation import bump_index_generation
+from app.services.log_writer import get_log_writer
+from app.services.parse_checkpoint import discard_checkpoint
+from app.services.suggest import get_suggestion_service
+from app.services.vector_db import get_vector_db
 from typing import Optional, List 
 
 router = APIRouter(prefix="/documents", tags=["Documents"])
 
 @router.post("/upload", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
 async def upload_document(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user = Depends(require_active_user)
@@ -64,32 +69,109 @@ async def upload_document(
     db.add(document)
     db.commit()
     db.refresh(document)
+    get_document_cache().invalidate(document.company_id, document.id)
+    get_suggestion_service().upsert(document.company_id, "document", document.id, document.filename)
     
     # Get uploader name
     uploader = db.query(User).filter(User.id == document.uploaded_by).first()
     uploader_name = uploader.name if uploader else "Unknown"
     
     # Log activity
-    activity = ActivityLog(
+    get_log_writer().log_activity(
         user_id=current_user.id,
         company_id=current_user.company_id,
         action="Document Uploaded",
         details={"filename": document.filename, "document_id": document.id, "size": storage_info["file_size"]}
     )
-    db.add(activity)
+    
+    # Auto-process document in a worker process
+    enqueue_documents(db, document.company_id, [document.id])
+    
+    return DocumentResponse(
+        id=document.id,
+        filename=document.filename,
+        mime_type=document.mime_type,
+        storage_path=document.storage_path,
+        status=document.status,
+        summary=document.summary,
+        uploaded_by=document.uploaded_by,
+        uploader_name=uploader_name,
+        company_id=document.company_id,
+        created_at=document.created_at,
+        processed_at=document.processed_at,
+        file_size=storage_info["file_size"]
+    )
+
+@router.put("/{document_id}/file", response_model=DocumentResponse)
+async def replace_document_file(
+    document_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user = Depends(require_active_user)
+):
+    """
+    Upload a new version of a document. It is re-indexed incrementally:
+    only chunks whose text changed are embedded again.
+    """
+    document = db.query(Document).filter(Document.id == document_id).first()
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    # Check access
+    if document.company_id != current_user.company_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    
+    # Validate file type
+    is_valid, mime_type = validate_file_type(file.filename)
+    if not is_valid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File type not allowed. Allowed: PDF, DOCX, PPTX, XLSX, TXT"
+        )
+    
+    file_content = await file.read()
+    max_size = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
+    if len(file_content) > max_size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File too large. Maximum size: {settings.MAX_UPLOAD_SIZE_MB}MB"
+        )
+    
+    # Save the new version; a job may still be reading the old file, so the
+    # re-index job deletes it once it has switched to the new one
+    storage = get_file_storage(settings.STORAGE_PATH)
+    storage_info = storage.save_file(file_content, file.filename, document.company_id)
+    metadata = dict(document.doc_metadata or {})
+    metadata["replaced_files"] = metadata.get("replaced_files", []) + [document.storage_path]
+    
+    document.filename = file.filename
+    document.mime_type = mime_type
+    document.storage_path = storage_info["storage_path"]
+    document.doc_metadata = metadata
+    document.status = "queued"
+    document.processed_at = None
     db.commit()
+    get_document_cache().invalidate(document.company_id, document.id)
+    get_suggestion_service().upsert(document.company_id, "document", document.id, document.filename)
     
-    # Auto-process document in background
-    def process_task(doc_id=document.id):
-        from app.core.database import SessionLocal
-        db_task = SessionLocal()
-        try:
-            processor = get_document_processor()
-            processor.process_document(doc_id, db_task)
-        finally:
-            db_task.close()
+    get_log_writer().log_activity(
+        user_id=current_user.id,
+        company_id=current_user.company_id,
+        action="Document Replaced",
+        details={"filename": document.filename, "document_id": document.id, "size": storage_info["file_size"]}
+    )
+    
+    # Re-index in a worker process
+    enqueue_documents(db, document.company_id, [document.id])
+    db.refresh(document)
     
-    background_tasks.add_task(process_task)
+    uploader = db.query(User).filter(User.id == document.uploaded_by).first()
     
     return DocumentResponse(
         id=document.id,
@@ -99,7 +181,7 @@ async def upload_document(
         status=document.status,
         summary=document.summary,
         uploaded_by=document.uploaded_by,
-        uploader_name=uploader_name,
+        uploader_name=uploader.name if uploader else "Unknown",
         company_id=document.company_id,
         created_at=document.created_at,
         processed_at=document.processed_at,
@@ -151,6 +233,8 @@ async def upload_multiple_documents(
             db.add(document)
             db.commit()
             db.refresh(document)
+            get_document_cache().invalidate(document.company_id, document.id)
+            get_suggestion_service().upsert(document.company_id, "document", document.id, document.filename)
             
             # Get uploader name
             uploader = db.query(User).filter(User.id == document.uploaded_by).first()
@@ -357,10 +441,20 @@ def delete_document(
     # Delete file from storage
     storage = get_file_storage(settings.STORAGE_PATH)
     storage.delete_file(document.storage_path)
+    for storage_path in (document.doc_metadata or {}).get("replaced_files", []):
+        storage.delete_file(storage_path)
+    discard_checkpoint(document_id)
+    
+    # Remove from the search index
+    get_vector_db().delete_by_document(document_id, document.company_id)
+    db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).delete(synchronize_session=False)
     
     # Delete database record
     db.delete(document)
     db.commit()
+    get_document_cache().invalidate(document.company_id, document_id)
+    get_suggestion_service().remove(document.company_id, "document", document_id)
+    bump_index_generation(db, document.company_id)
     
     return {"message": "Document deleted successfully"}
     
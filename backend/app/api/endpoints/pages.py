@@ -1053,6 +1053,7 @@ def documents_management():
                 font-weight: 600;
             }
             .badge-uploaded { background: #d4edda; color: #155724; }
+            .badge-queued,
             .badge-processing { background: #fff3cd; color: #856404; }
             .badge-processed { background: #cce5ff; color: #004085; }
             .file-icon {
@@ -1454,7 +1455,7 @@ def documents_management():
                     });
                     
                     if (response.ok) {
-                        alert("Processing started! Refresh in a few seconds to see updated status.");
+                        alert("Processing queued! Refresh in a few seconds to see updated status.");
                         loadDocuments();
                     } else {
                         const error = await response.json();
@@ -1,9 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.models.models import Document
 from app.api.deps.auth import require_active_user
-from app.services.document_processor import get_document_processor
+from app.services.job_queue import enqueue_documents, get_document_job
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,14 +11,16 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/processing", tags=["Document Processing"])
 
 @router.post("/process/{document_id}")
-async def process_document(
+def process_document(
     document_id: int,
-    background_tasks: BackgroundTasks,
+    reprocess: bool = False,
     db: Session = Depends(get_db),
     current_user = Depends(require_active_user)
 ):
     """
-    Process a document: extract text, chunk, embed, store
+    Process a document: extract text, chunk, embed, store.
+    With reprocess=true a processed document is indexed again; only new
+    or changed chunks are embedded.
     """
     # Check document exists
     document = db.query(Document).filter(Document.id == document_id).first()
@@ -30,29 +32,16 @@ async def process_document(
         raise HTTPException(status_code=403, detail="Access denied")
     
     # Check if already processed
-    if document.status == "processed":
+    if document.status == "processed" and not reprocess:
         return {"message": "Document already processed", "document_id": document_id}
     
-    # Add to background tasks (non-blocking)
-    processor = get_document_processor()
-    
-    # Process in background
-    def process_task():
-        # Create new DB session for background task
-        from app.core.database import SessionLocal
-        db_task = SessionLocal()
-        try:
-            result = processor.process_document(document_id, db_task)
-            logger.info(f"Background processing result: {result}")
-        finally:
-            db_task.close()
-    
-    background_tasks.add_task(process_task)
+    # Picked up by a worker process (python -m app.worker)
+    enqueue_documents(db, document.company_id, [document_id])
     
     return {
-        "message": "Processing started",
+        "message": "Processing queued",
         "document_id": document_id,
-        "status": "processing"
+        "status": "queued"
     }
 
 @router.get("/status/{document_id}")
@@ -84,12 +73,12 @@ def get_processing_status(
         "status": document.status,
         "chunks_created": chunk_count,
         "summary": document.summary,
-        "processed_at": document.processed_at
+        "processed_at": document.processed_at,
+        "job": get_document_job(db, document_id)
     }
 
 @router.post("/process-all")
-async def process_all_documents(
-    background_tasks: BackgroundTasks,
+def process_all_documents(
     db: Session = Depends(get_db),
     current_user = Depends(require_active_user)
 ):
@@ -105,19 +94,7 @@ async def process_all_documents(
     if not documents:
         return {"message": "No documents to process"}
     
-    processor = get_document_processor()
-    
-    # Process each in background
-    for doc in documents:
-        def process_task(doc_id=doc.id):
-            from app.core.database import SessionLocal
-            db_task = SessionLocal()
-            try:
-                processor.process_document(doc_id, db_task)
-            finally:
-                db_task.close()
-        
-        background_tasks.add_task(process_task)
+    enqueue_documents(db, current_user.company_id, [d.id for d in documents])
     
     return {
         "message": f"Processing {len(documents)} documents",
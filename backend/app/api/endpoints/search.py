@@ -1,46 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app.core.database import get_db
-from app.api.deps.auth import require_active_user
-from app.schemas.search import SearchRequest, SearchResponse, SearchResult
+from app.api.deps.auth import require_active_user, require_system_admin
+from app.schemas.search import (
+    SearchRequest, SearchResponse, SearchResult,
+    AdminSearchRequest, AdminSearchResponse, AdminSearchResult, TenantTiming
+)
+from app.services.log_writer import get_log_writer
 from app.services.search import get_search_service
 from app.models.models import ActivityLog, User, SystemAdmin
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/search", tags=["Search"])
 
 @router.post("/", response_model=SearchResponse)
-def search_documents(
+async def search_documents(
     request: SearchRequest,
-    db: Session = Depends(get_db),
     current_user = Depends(require_active_user)
 ):
-    """Semantic search with filters"""
+    """Semantic search with filters (async end-to-end)"""
     if isinstance(current_user, SystemAdmin):
         raise HTTPException(
             status_code=400,
-            detail="System admins must specify company_id"
+            detail="System admins must use /search/admin"
         )
     
     company_id = current_user.company_id
     user_id = current_user.id
     
     search_service = get_search_service()
-    result = search_service.search(
+    result = await search_service.search(
         query=request.query,
         company_id=company_id,
         user_id=user_id,
-        db=db,
         top_k=request.top_k,
         file_type=request.file_type,
         date_from=request.date_from,
-        date_to=request.date_to
+        date_to=request.date_to,
+        mode=request.mode,
+        explain=request.explain,
+        collapse=request.collapse,
+        mmr_lambda=request.mmr_lambda,
+        cursor=request.cursor
     )
     
     if not result.get("success"):
-        raise HTTPException(status_code=500, detail=result.get("error", "Search failed"))
+        raise HTTPException(status_code=result.get("status_code", 500), detail=result.get("error", "Search failed"))
     
     search_results = [
         SearchResult(
@@ -48,10 +56,12 @@ def search_documents(
             filename=r["filename"],
             chunk_text=r["chunk_text"],
             snippet=r["snippet"],
+            highlights=r.get("highlights", []),
             chunk_index=r["chunk_index"],
             score=r["score"],
             file_type=r["file_type"],
-            created_at=r["created_at"]
+            created_at=r["created_at"],
+            matched_chunks=r.get("matched_chunks")
         )
         for r in result["results"]
     ]
@@ -61,7 +71,50 @@ def search_documents(
         results=search_results,
         total_results=result["total_results"],
         search_time_ms=result["search_time_ms"],
-        filters_applied=result["filters_applied"]
+        filters_applied=result["filters_applied"],
+        mode=result.get("mode"),
+        explain=result.get("explain"),
+        next_cursor=result.get("next_cursor")
+    )
+
+@router.post("/admin", response_model=AdminSearchResponse)
+async def admin_search_documents(
+    request: AdminSearchRequest,
+    current_user = Depends(require_system_admin)
+):
+    """Cross-tenant semantic search for system admins (partial results past the deadline)"""
+    result = await get_search_service().admin_search(
+        query=request.query,
+        top_k=request.top_k,
+        company_ids=request.company_ids,
+        file_type=request.file_type,
+        date_from=request.date_from,
+        date_to=request.date_to,
+        deadline_ms=request.deadline_ms
+    )
+    
+    if not result.get("success"):
+        raise HTTPException(status_code=500, detail=result.get("error", "Search failed"))
+    
+    get_log_writer().log_activity(
+        user_id=None,
+        company_id=None,
+        action="Admin Search",
+        details={
+            "admin_id": current_user.id,
+            "query": request.query,
+            "companies": len(result["tenants"]),
+            "partial": result["partial"]
+        }
+    )
+    
+    return AdminSearchResponse(
+        query=result["query"],
+        results=[AdminSearchResult(**r) for r in result["results"]],
+        total_results=result["total_results"],
+        search_time_ms=result["search_time_ms"],
+        partial=result["partial"],
+        tenants=[TenantTiming(**t) for t in result["tenants"]]
     )
 
 @router.get("/history")
@@ -98,25 +151,38 @@ def get_available_filters(
     db: Session = Depends(get_db),
     current_user = Depends(require_active_user)
 ):
-    """Get available filter options for current company"""
-    from app.models.models import ActivityLog, Document
-    from sqlalchemy import func
+    """Get available filter options for current company (aggregated, cached per company)"""
+    from app.services.document_cache import get_document_cache
     
     if isinstance(current_user, SystemAdmin):
         raise HTTPException(status_code=400, detail="Not available for system admins")
     
-    company_id = current_user.company_id
-    
-    # Get unique file types
-    docs = db.query(Document).filter(Document.company_id == company_id).all()
+    return get_document_cache().get_filter_options(db, current_user.company_id)
+
+@router.get("/suggest")
+def suggest(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(8, ge=1, le=20),
+    db: Session = Depends(get_db),
+    current_user = Depends(require_active_user)
+):
+    """Search-as-you-type completions from past queries, filenames and case titles"""
+    from app.services.suggest import get_suggestion_service
     
-    file_types = set()
-    for doc in docs:
-        if '.' in doc.filename:
-            ext = doc.filename.rsplit('.', 1)[1].lower()
-            file_types.add(ext)
+    if isinstance(current_user, SystemAdmin):
+        raise HTTPException(status_code=400, detail="Not available for system admins")
     
+    start_time = time.perf_counter()
+    suggestions = get_suggestion_service().suggest(db, current_user.company_id, q, limit)
     return {
-        "file_types": sorted(list(file_types)),
-        "total_documents": len(docs)
-    }
\ No newline at end of file
+        "query": q,
+        "suggestions": suggestions,
+        "took_ms": round((time.perf_counter() - start_time) * 1000, 2)
+    }
+
+@router.get("/stats")
+def get_search_stats(
+    current_user = Depends(require_system_admin)
+):
+    """Search cache statistics (process-wide, so system admins only)"""
+    return get_search_service().get_cache_stats()
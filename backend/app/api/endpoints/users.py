@@ -11,6 +11,7 @@ from app.schemas.users import (
 )
 from app.api.deps.auth import require_active_user, require_system_admin
 from app.services.email import send_invite_email
+from app.services.log_writer import get_log_writer
 from datetime import datetime, timedelta
 import secrets
 
@@ -334,14 +335,12 @@ async def invite_user(
     background_tasks.add_task(send_email_bg)
     
     # Log activity
-    activity = ActivityLog(
+    get_log_writer().log_activity(
         user_id=current_user.id,
         company_id=company_id,
         action="User Invited",
         details={"invited_email": invite_data.email, "invited_name": invite_data.name}
     )
-    db.add(activity)
-    db.commit()
     
     return {"message": "User created! Email sending in background.", "user_id": new_user.id}
     
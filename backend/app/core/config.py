@@ -43,13 +43,83 @@ class Settings(BaseSettings):
     # File Upload
     MAX_UPLOAD_SIZE_MB: int = 50
     
+    # Embeddings
+    EMBEDDING_PROVIDER: str = "gemini"  # gemini | local (offline, deterministic)
+    EMBEDDING_MODEL: str = "models/embedding-001"
+    EMBEDDING_DIMENSION: int = 768
+    EMBEDDING_BATCH_SIZE: int = 100  # Max texts per batchEmbedContents request
+    EMBEDDING_BATCH_MAX_TOKENS: int = 20000  # Approximate token budget per request
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "/data/cache/embeddings.db"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 200000
+    EMBEDDING_MAX_WORKERS: int = 4  # Concurrent batch requests in flight
+    EMBEDDING_REQUESTS_PER_MINUTE: int = 1500  # Provider quota, split across EMBEDDING_QUOTA_SHARES
+    EMBEDDING_QUOTA_SHARES: Optional[int] = None  # Processes calling the provider; unset = API + JOB_WORKER_PROCESSES
+    EMBEDDING_MAX_RETRIES: int = 5
+    EMBEDDING_BACKOFF_BASE_SECONDS: float = 1.0
+    EMBEDDING_BACKOFF_MAX_SECONDS: float = 30.0
+    QUERY_EMBEDDING_CACHE_SIZE: int = 2000
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = 3600
+    
     # Search
     VECTOR_TOP_K: int = 5
     CHUNK_SIZE: int = 800
+    SEARCH_VECTOR_WORKERS: int = 8  # Threads for blocking Chroma queries
+    SEARCH_DB_WORKERS: int = 8  # Threads for Postgres work on the search path (<= pool size)
+    HYBRID_EMBEDDING_TIMEOUT_MS: int = 1500  # Serve lexical-only results past this
+    RRF_K: int = 60
+    SEARCH_CACHE_SIZE: int = 5000  # Cached result pages (each at most top_k results)
+    SEARCH_CACHE_TTL_SECONDS: int = 600
+    SEARCH_CANDIDATE_POOL: int = 50  # Candidates ranked when cursors page past the first 3x top_k; bounds how deep they page
+    SEARCH_CURSOR_CACHE_SIZE: int = 2000  # Ranked candidate lists kept for pagination
+    SEARCH_CURSOR_TTL_SECONDS: int = 300
+    SEMANTIC_CACHE_ENABLED: bool = True  # Reuse vector candidates for paraphrased queries
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95  # Cosine similarity between query embeddings
+    SEMANTIC_CACHE_ENTRIES: int = 256  # Queries kept per company and filter combination
+    SEMANTIC_CACHE_TTL_SECONDS: int = 600
+    SEMANTIC_CACHE_VARIANTS: int = 16  # Filter combinations kept per company (least recently used evicted)
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 20000  # Cached queries across all companies
+    SUGGEST_HISTORY_DAYS: int = 90  # Past searches considered when an index is built
+    SUGGEST_MIN_QUERY_COUNT: int = 2  # Past queries are suggested once searched this often
+    SUGGEST_MAX_QUERY_LENGTH: int = 100
+    SUGGEST_MIN_PREFIX_LENGTH: int = 2
+    SUGGEST_SCAN_LIMIT: int = 2000  # Index keys examined per lookup (bounds latency)
+    SUGGEST_REFRESH_SECONDS: int = 30  # Incremental pull of new rows
+    SUGGEST_REBUILD_SECONDS: int = 1800  # Full rebuild (catches deletions made elsewhere)
+    ADMIN_SEARCH_DEADLINE_MS: int = 3000  # Cross-tenant search returns partial results past this
+    ADMIN_SEARCH_WORKERS: int = 4  # Threads for cross-tenant fan-out (kept off SEARCH_VECTOR_WORKERS)
+    
+    # Batched search history / activity log writes
+    LOG_WRITER_BATCH_SIZE: int = 500  # Flush as soon as this many rows are queued
+    LOG_WRITER_FLUSH_INTERVAL_MS: int = 200
+    LOG_WRITER_MAX_QUEUE: int = 50000  # Rows beyond this are dropped
+    
+    # Parsing and chunking run in a process pool (per API/worker process)
+    PARSE_POOL_WORKERS: int = 2
+    PARSE_POOL_MAX_TASKS_PER_CHILD: int = 20  # Recycle pool processes after this many documents
+    PARSE_POOL_MEMORY_LIMIT_MB: int = 2048  # RLIMIT_AS per pool process (0 = unlimited)
+    
+    # Streaming ingestion: parse -> embed -> store overlap through bounded queues
+    PIPELINE_PAGES_PER_SEGMENT: int = 10  # PDF pages parsed and chunked per pool task
+    PIPELINE_BATCH_CHUNKS: int = 100  # Chunks embedded and stored together
+    PIPELINE_QUEUE_SIZE: int = 4  # Batches buffered between stages
+    
+    # Document processing queue (python -m app.worker)
+    JOB_WORKER_PROCESSES: int = 2  # Concurrent documents per worker host
+    JOB_POLL_INTERVAL_SECONDS: float = 2.0  # Idle wait between claim attempts
+    JOB_LEASE_SECONDS: int = 300  # A job whose lease lapses is reclaimed by another worker
+    JOB_HEARTBEAT_SECONDS: int = 30  # Lease renewal interval while a job runs
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_BACKOFF_BASE_SECONDS: float = 30.0  # Retry delay doubles per attempt
+    JOB_BACKOFF_MAX_SECONDS: float = 1800.0
     
     # Paths
     STORAGE_PATH: str
     CHROMA_PATH: str
+    # Chroma server shared by the API and workers; unset = local files at
+    # CHROMA_PATH, which only one process may open
+    CHROMA_HOST: Optional[str] = None
+    CHROMA_PORT: int = 8000
     LOG_PATH: str
     BACKUP_PATH: str
     
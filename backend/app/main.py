@@ -106,11 +106,20 @@ app.include_router(notifications.router)
 @app.on_event("startup")
 async def on_startup():
     startup_checks()
+    from app.services.log_writer import get_log_writer
+    get_log_writer().start()
 
 # Shutdown event
 @app.on_event("shutdown")
 async def on_shutdown():
     logger.info("Shutting down Docent API...")
+    from app.services.embeddings import close_embedding_service
+    from app.services.search import shutdown_search_service
+    await close_embedding_service()
+    shutdown_search_service()
+    # Flush queued history/activity rows while the engine is still up
+    from app.services.log_writer import shutdown_log_writer
+    shutdown_log_writer()
     # Close database connections
     from app.core.database import engine
     engine.dispose()
@@ -121,6 +130,13 @@ async def on_shutdown():
 async def favicon():
     return {"message": "no favicon"}
 
+# Prometheus-style metrics (search latency histograms)
+@app.get("/metrics")
+async def metrics():
+    from fastapi.responses import PlainTextResponse
+    from app.utils.metrics import registry
+    return PlainTextResponse(registry.render())
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -139,6 +155,22 @@ async def health_check():
         status["checks"]["database"] = "error"
         status["status"] = "degraded"
     
+    # Document processing backlog (drained by app.worker)
+    try:
+        from app.core.database import SessionLocal
+        from app.services.job_queue import queue_depth
+        db = SessionLocal()
+        try:
+            status["checks"]["job_queue"] = queue_depth(db)
+        finally:
+            db.close()
+    except Exception:
+        status["checks"]["job_queue"] = "unknown"
+    
+    # Batched log writer backlog
+    from app.services.log_writer import get_log_writer
+    status["checks"]["log_queue_depth"] = get_log_writer().stats()["queue_depth"]
+    
     # Disk space check
     try:
         stat = os.statvfs("/")
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, JSON, Computed, Index, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -21,6 +22,8 @@ class Company(Base):
     domain_restriction = Column(String, nullable=True)
     plan_limits = Column(JSON, default={})
     is_active = Column(Boolean, default=True)
+    # Bumped whenever the searchable corpus changes; keys search caches
+    index_generation = Column(Integer, default=0, nullable=False, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow)
     
     users = relationship("User", back_populates="company")
@@ -78,6 +81,11 @@ class Document(Base):
     company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
     uploaded_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     filename = Column(String, nullable=False)
+    # Lowercase extension, same rule as utils.storage.get_file_type
+    file_type = Column(
+        String,
+        Computed(r"coalesce(lower(substring(filename from '\.([^.]*)$')), 'unknown')", persisted=True)
+    )
     mime_type = Column(String, nullable=False)
     storage_path = Column(String, nullable=False)
     status = Column(String, default="pending")
@@ -89,6 +97,9 @@ class Document(Base):
     company = relationship("Company", back_populates="documents")
     chunks = relationship("DocumentChunk", back_populates="document")
     
+    __table_args__ = (
+        Index("idx_documents_company_file_type", "company_id", "file_type"),
+    )
 
 class DocumentChunk(Base):
     __tablename__ = "doc_chunks"
@@ -100,9 +111,42 @@ class DocumentChunk(Base):
     chunk_index = Column(Integer, nullable=False)
     chunk_id_for_vector = Column(String, unique=True, nullable=False)
     chunk_metadata = Column(JSON, default={})  # Changed from metadata
+    # Full-text index for lexical / hybrid search, maintained by Postgres
+    chunk_tsv = Column(TSVECTOR, Computed("to_tsvector('english', chunk_text)", persisted=True))
     created_at = Column(DateTime, default=datetime.utcnow)
     
     document = relationship("Document", back_populates="chunks")
+    
+    __table_args__ = (
+        Index("idx_doc_chunks_tsv", "chunk_tsv", postgresql_using="gin"),
+    )
+
+class ProcessingJob(Base):
+    """Durable document processing job, claimed by workers with SKIP LOCKED"""
+    __tablename__ = "processing_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued | running | done | failed | superseded
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("idx_processing_jobs_claim", "status", "run_after"),
+        # At most one waiting job per document (one more may be running)
+        Index(
+            "idx_processing_jobs_queued_document", "document_id", unique=True,
+            postgresql_where=text("status = 'queued'")
+        ),
+    )
 
 class CaseTemplate(Base):
     __tablename__ = "case_templates"
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Literal
 from datetime import datetime
 
 class SearchRequest(BaseModel):
@@ -9,20 +9,61 @@ class SearchRequest(BaseModel):
     file_type: Optional[str] = None  # pdf, docx, txt, etc.
     date_from: Optional[datetime] = None
     date_to: Optional[datetime] = None
+    # semantic: vectors, lexical: full-text, hybrid: both fused with RRF
+    mode: Literal["semantic", "lexical", "hybrid"] = "semantic"
+    explain: bool = False  # Return per-stage timings and candidate counts
+    # One result per document, scored by its best chunk (max) or all its chunks (sum)
+    collapse: Optional[Literal["max", "sum"]] = None
+    # MMR diversity re-ranking: weight of relevance vs novelty (1.0 = plain ranking)
+    mmr_lambda: Optional[float] = Field(None, ge=0.0, le=1.0)
+    # next_cursor from a previous response: returns the following top_k results
+    # of that search; the other parameters (except top_k) are ignored
+    cursor: Optional[str] = None
     
 class SearchResult(BaseModel):
     document_id: int
     filename: str
     chunk_text: str
     snippet: str  # NEW: relevant portion
+    highlights: List[List[int]] = []  # [start, end) offsets of query matches in snippet
     chunk_index: int
     score: float
     file_type: str  # NEW
     created_at: Optional[datetime] = None  # NEW
+    matched_chunks: Optional[int] = None  # Chunks of the document that matched (collapsed results)
     
 class SearchResponse(BaseModel):
     query: str
     results: List[SearchResult]
     total_results: int
     search_time_ms: float
-    filters_applied: dict  # NEW: show active filters
\ No newline at end of file
+    filters_applied: dict  # NEW: show active filters
+    mode: Optional[str] = None  # Retrieval mode actually served (e.g. lexical_fallback)
+    explain: Optional[dict] = None  # Stage timings (ms) and counts when requested
+    next_cursor: Optional[str] = None  # Pass as cursor for the next page; None on the last page
+
+class AdminSearchRequest(BaseModel):
+    query: str
+    top_k: int = 10
+    company_ids: Optional[List[int]] = None  # Default: every company
+    file_type: Optional[str] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    deadline_ms: Optional[int] = Field(None, gt=0)  # Default: ADMIN_SEARCH_DEADLINE_MS
+
+class AdminSearchResult(SearchResult):
+    company_id: int
+
+class TenantTiming(BaseModel):
+    company_id: int
+    status: str  # ok, timeout or error
+    latency_ms: Optional[float] = None
+    candidates: int = 0
+
+class AdminSearchResponse(BaseModel):
+    query: str
+    results: List[AdminSearchResult]
+    total_results: int
+    search_time_ms: float
+    partial: bool  # Some companies missed the deadline or failed
+    tenants: List[TenantTiming]
@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.models import Document
+
+logger = logging.getLogger(__name__)
+
+class DocumentMetadataCache:
+    """
+    Per-company cache of the document fields search results need
+    (filename, created_at, file_type) and of the company's search filter
+    options. Misses are resolved with a single IN query; entries are
+    dropped when documents are uploaded or deleted.
+    """
+    
+    def __init__(self, ttl_seconds: int = 600, max_per_company: int = 50000):
+        self.ttl_seconds = ttl_seconds
+        self.max_per_company = max_per_company
+        self.hits = 0
+        self.misses = 0
+        self._companies = {}
+        self._lock = threading.Lock()
+    
+    def _company_entries(self, company_id: int) -> Dict:
+        """Cache entry of a company, reset when expired (lock held)"""
+        entry = self._companies.get(company_id)
+        now = time.monotonic()
+        if entry is None or entry["expires_at"] <= now:
+            entry = {"docs": {}, "filters": None, "expires_at": now + self.ttl_seconds}
+            self._companies[company_id] = entry
+        return entry
+    
+    def get_many(self, db: Session, company_id: int, document_ids: Iterable[int]) -> Dict[int, Dict]:
+        """Resolve metadata for several documents; unknown or deleted ids are omitted"""
+        wanted = {doc_id for doc_id in document_ids if doc_id is not None}
+        if not wanted:
+            return {}
+        
+        with self._lock:
+            docs = self._company_entries(company_id)["docs"]
+            found = {doc_id: docs[doc_id] for doc_id in wanted if doc_id in docs}
+            missing = wanted - found.keys()
+            self.hits += len(found)
+            self.misses += len(missing)
+        
+        if missing:
+            rows = db.query(Document.id, Document.filename, Document.created_at, Document.file_type).filter(
+                Document.company_id == company_id,
+                Document.id.in_(missing)
+            ).all()
+            loaded = {
+                row.id: {
+                    "filename": row.filename,
+                    "created_at": row.created_at,
+                    "file_type": row.file_type
+                }
+                for row in rows
+            }
+            found.update(loaded)
+            
+            with self._lock:
+                docs = self._company_entries(company_id)["docs"]
+                if len(docs) + len(loaded) > self.max_per_company:
+                    docs.clear()
+                docs.update(loaded)
+        
+        return found
+    
+    def get_filter_options(self, db: Session, company_id: int) -> Dict:
+        """File types present (with counts) and total documents, from one GROUP BY"""
+        with self._lock:
+            filters = self._company_entries(company_id)["filters"]
+        if filters is not None:
+            return filters
+        
+        rows = db.query(Document.file_type, func.count(Document.id)).filter(
+            Document.company_id == company_id
+        ).group_by(Document.file_type).all()
+        counts = {file_type: count for file_type, count in rows if file_type and file_type != "unknown"}
+        filters = {
+            "file_types": sorted(counts),
+            "file_type_counts": counts,
+            "total_documents": sum(count for _, count in rows)
+        }
+        
+        with self._lock:
+            self._company_entries(company_id)["filters"] = filters
+        return filters
+    
+    def invalidate(self, company_id: int, document_id: int = None):
+        """Drop one document, or a whole company, from the cache"""
+        with self._lock:
+            if document_id is None:
+                self._companies.pop(company_id, None)
+            elif company_id in self._companies:
+                entry = self._companies[company_id]
+                entry["docs"].pop(document_id, None)
+                entry["filters"] = None
+    
+    def stats(self) -> Dict:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "companies": len(self._companies),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+# Singleton instance
+_document_cache = None
+
+def get_document_cache() -> DocumentMetadataCache:
+    """Get document metadata cache instance"""
+    global _document_cache
+    if _document_cache is None:
+        _document_cache = DocumentMetadataCache()
+    return _document_cache
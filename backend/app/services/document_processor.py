@@ -1,153 +1,396 @@
+import itertools
 import logging
+import queue
+import threading
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 from sqlalchemy.orm import Session
 from app.models.models import Document, DocumentChunk
-from app.utils.parsers import DocumentParser
-from app.utils.chunking import chunk_document_text
+from app.utils.chunking import renumber_chunks
 from app.utils.storage import get_file_storage
 from app.services.embeddings import get_embedding_service
-from app.services.vector_db import get_vector_db
+from app.services.vector_db import get_vector_db, build_chunk_metadata
+from app.services.index_generation import bump_index_generation
+from app.services.parse_pool import get_parse_pool
+from app.services.parse_checkpoint import ParseCheckpoint, discard_checkpoint
 from app.core.config import settings
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Marks the end of a stage's output
+_DONE = object()
+# Stages re-check for an abort this often while blocked on a queue
+_POLL_SECONDS = 0.5
+SUMMARY_CHARS = 500
+# Documents with less extracted text fail before anything is embedded
+MIN_TEXT_CHARS = 50
+
+def _put(target: queue.Queue, item, abort: threading.Event) -> bool:
+    """Blocking put that gives up once the pipeline is aborted"""
+    while not abort.is_set():
+        try:
+            target.put(item, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get(source: queue.Queue, abort: threading.Event):
+    """Blocking get that returns _DONE once the pipeline is aborted"""
+    while not abort.is_set():
+        try:
+            return source.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            continue
+    return _DONE
+
 class DocumentProcessor:
-    """Process documents: parse, chunk, embed, store"""
+    """
+    Process documents: parse, chunk, embed, store. The stages run as a
+    pipeline connected by bounded queues:
+        
+        parse pool (page ranges -> chunks) -> embed thread -> store (caller)
+    
+    so only a few segments and batches are in memory at a time, and the
+    first chunks are searchable long before a large file is done.
+    
+    Chunk ids are derived from content, so reprocessing a document only
+    embeds chunks that are new or changed; unchanged chunks are kept (and
+    renumbered), vanished ones are deleted.
+    
+    A failed attempt that may succeed later keeps what it finished: parsed
+    segments are checkpointed to storage and stored chunks stay in place,
+    so the retry resumes parsing after the last saved segment and only
+    embeds chunks that were not stored yet.
+    """
     
     def __init__(self):
-        self.parser = DocumentParser()
+        self.parse_pool = get_parse_pool()
         self.embedding_service = get_embedding_service()
         self.vector_db = get_vector_db()
         self.storage = get_file_storage(settings.STORAGE_PATH)
     
+    def _produce(
+        self,
+        file_path: Path,
+        mime_type: str,
+        document_id: int,
+        existing: Dict[str, int],
+        checkpoint: ParseCheckpoint,
+        batches: queue.Queue,
+        abort: threading.Event,
+        state: Dict
+    ):
+        """Stage 1: parse and chunk segments, emit batches of chunks not stored yet"""
+        try:
+            batch = []
+            next_index = 0
+            occurrences = {}
+            saved, parsed = checkpoint.load()
+            state["segments_reused"] = len(saved)
+            segments = saved if parsed else itertools.chain(saved, self.parse_pool.iter_segments(
+                file_path, mime_type, document_id, settings.CHUNK_SIZE, settings.PIPELINE_PAGES_PER_SEGMENT,
+                start_segment=len(saved)
+            ))
+            for position, segment in enumerate(segments):
+                if segment.get("error"):
+                    state["error"] = segment["error"]
+                    state["retryable"] = segment["retryable"]
+                    return
+                if position >= len(saved):
+                    checkpoint.save_segment(segment)
+                if len(state["head"]) <= SUMMARY_CHARS:
+                    state["head"] = (state["head"] + "\n\n" + segment["head"]) if state["head"] else segment["head"]
+                state["text_length"] += segment["text_length"]
+                
+                chunks = renumber_chunks(segment["chunks"], document_id, next_index, occurrences)
+                next_index += len(chunks)
+                state["chunks"] += len(chunks)
+                for chunk in chunks:
+                    state["seen"].add(chunk["chunk_id"])
+                    if chunk["chunk_id"] in existing:
+                        state["reused"].append((chunk["chunk_id"], chunk["chunk_index"]))
+                        continue
+                    batch.append(chunk)
+                # Nothing is embedded until the document has enough text
+                if len(state["head"].strip()) >= MIN_TEXT_CHARS:
+                    while len(batch) >= settings.PIPELINE_BATCH_CHUNKS:
+                        if not _put(batches, batch[:settings.PIPELINE_BATCH_CHUNKS], abort):
+                            return
+                        batch = batch[settings.PIPELINE_BATCH_CHUNKS:]
+                if abort.is_set():
+                    return
+            if not parsed:
+                checkpoint.mark_parsed()
+            if len(state["head"].strip()) < MIN_TEXT_CHARS:
+                state["error"] = "Insufficient text extracted"
+                state["retryable"] = False
+                return
+            if batch:
+                _put(batches, batch, abort)
+        except Exception as e:
+            logger.error(f"Parsing document {document_id} failed: {e}")
+            state["error"] = str(e)
+        finally:
+            _put(batches, _DONE, abort)
+    
+    def _embed(self, batches: queue.Queue, embedded: queue.Queue, abort: threading.Event, state: Dict):
+        """Stage 2: embed each batch of chunks"""
+        try:
+            while True:
+                batch = _get(batches, abort)
+                if batch is _DONE:
+                    return
+                embeddings = self.embedding_service.generate_embeddings_batch(
+                    [chunk["chunk_text"] for chunk in batch]
+                )
+                if not _put(embedded, (batch, embeddings), abort):
+                    return
+        except Exception as e:
+            logger.error(f"Embedding stage failed: {e}")
+            state["error"] = str(e)
+            # Unblock the parse stage, which would wait on a full queue
+            abort.set()
+        finally:
+            _put(embedded, _DONE, abort)
+    
+    def _store(self, db: Session, document: Document, chunks: List[Dict], embeddings: List[List[float]]):
+        """Stage 3: write one batch to the vector store and Postgres"""
+        success = self.vector_db.add_chunks(
+            company_id=document.company_id,
+            chunk_ids=[chunk["chunk_id"] for chunk in chunks],
+            embeddings=embeddings,
+            texts=[chunk["chunk_text"] for chunk in chunks],
+            metadatas=[build_chunk_metadata(document, chunk["chunk_index"]) for chunk in chunks]
+        )
+        if not success:
+            raise RuntimeError("Failed to store in vector DB")
+        db.add_all([
+            DocumentChunk(
+                document_id=document.id,
+                company_id=document.company_id,
+                chunk_text=chunk["chunk_text"],
+                chunk_index=chunk["chunk_index"],
+                chunk_id_for_vector=chunk["chunk_id"]
+            )
+            for chunk in chunks
+        ])
+        db.commit()
+    
+    def _remove_chunks(self, db: Session, company_id: int, chunk_ids: List[str]):
+        """Delete chunks from the vector store and Postgres"""
+        for start in range(0, len(chunk_ids), settings.PIPELINE_BATCH_CHUNKS):
+            batch = chunk_ids[start:start + settings.PIPELINE_BATCH_CHUNKS]
+            if not self.vector_db.delete_chunks(company_id, batch):
+                raise RuntimeError("Failed to delete from vector DB")
+            db.query(DocumentChunk).filter(
+                DocumentChunk.chunk_id_for_vector.in_(batch)
+            ).delete(synchronize_session=False)
+        db.commit()
+    
+    def _reconcile(self, db: Session, document: Document, existing: Dict[str, Dict], state: Dict) -> Dict[str, int]:
+        """Renumber kept chunks and delete those no longer in the document"""
+        moved = [
+            {"id": existing[chunk_id]["id"], "chunk_index": chunk_index}
+            for chunk_id, chunk_index in state["reused"]
+            if existing[chunk_id]["chunk_index"] != chunk_index
+        ]
+        if moved:
+            db.bulk_update_mappings(DocumentChunk, moved)
+            db.commit()
+        # Metadata carries the chunk index and the (possibly renamed) filename
+        reused = state["reused"]
+        for start in range(0, len(reused), settings.PIPELINE_BATCH_CHUNKS):
+            batch = reused[start:start + settings.PIPELINE_BATCH_CHUNKS]
+            self.vector_db.update_metadatas(
+                document.company_id,
+                [chunk_id for chunk_id, _ in batch],
+                [build_chunk_metadata(document, chunk_index) for _, chunk_index in batch]
+            )
+        
+        vanished = [chunk_id for chunk_id in existing if chunk_id not in state["seen"]]
+        self._remove_chunks(db, document.company_id, vanished)
+        return {"kept": len(reused), "moved": len(moved), "deleted": len(vanished)}
+    
+    def _fail(
+        self,
+        db: Session,
+        document_id: int,
+        error: str,
+        retryable: bool = True,
+        company_id: Optional[int] = None,
+        added: Optional[List[str]] = None,
+        stored: int = 0
+    ) -> Dict:
+        """
+        Mark a document failed. Chunks of this run whose write completed
+        (the first `stored` of `added`) and the parse checkpoint are kept
+        for a retry, unless the failure is permanent.
+        """
+        try:
+            db.rollback()
+            discard = (added or [])[stored if retryable else 0:]
+            if not retryable:
+                discard_checkpoint(document_id)
+            if discard:
+                self._remove_chunks(db, company_id, discard)
+            if added:
+                bump_index_generation(db, company_id)
+            document = db.query(Document).filter(Document.id == document_id).first()
+            if document:
+                document.status = "error"
+                db.commit()
+        except Exception as e:
+            logger.error(f"Could not mark document {document_id} failed: {e}")
+        return {"success": False, "error": error, "retryable": retryable}
+    
     def process_document(self, document_id: int, db: Session) -> Dict:
         """
         Process a single document
-        Returns: dict with status and details
+        Returns: dict with status and details ("retryable": False when
+        another attempt cannot succeed, e.g. an unparseable file)
         """
+        company_id = None
+        abort = threading.Event()
+        stages = []
+        added = []
+        stored = 0
         try:
             # Get document from database
             document = db.query(Document).filter(Document.id == document_id).first()
             if not document:
-                return {"success": False, "error": "Document not found"}
+                return {"success": False, "error": "Document not found", "retryable": False}
+            company_id = document.company_id
             
             # Update status
             document.status = "processing"
+            metadata = dict(document.doc_metadata or {})
+            replaced_files = metadata.pop("replaced_files", [])
+            if replaced_files:
+                document.doc_metadata = metadata
             db.commit()
+            # Earlier versions' files: no run reads them from now on
+            for storage_path in replaced_files:
+                self.storage.delete_file(storage_path)
             
-            # Step 1: Parse document
-            logger.info(f"Parsing document {document_id}: {document.filename}")
-            file_path = self.storage.get_file_path(document.storage_path)
-            
-            parse_result = self.parser.parse_document(file_path, document.mime_type)
-            
-            if parse_result.get("error"):
-                document.status = "error"
-                db.commit()
-                return {"success": False, "error": parse_result["error"]}
-            
-            text = parse_result["text"]
-            
-            if not text or len(text.strip()) < 50:
-                document.status = "error"
-                db.commit()
-                return {"success": False, "error": "Insufficient text extracted"}
-            
-            # Step 2: Chunk text
-            logger.info(f"Chunking document {document_id}")
-            chunks = chunk_document_text(text, document_id, chunk_size=settings.CHUNK_SIZE)
-            
-            if not chunks:
-                document.status = "error"
-                db.commit()
-                return {"success": False, "error": "No chunks created"}
+            # Chunks of an earlier version (or an interrupted run) are reused by id
+            existing = {
+                row.chunk_id_for_vector: {"id": row.id, "chunk_index": row.chunk_index}
+                for row in db.query(
+                    DocumentChunk.id, DocumentChunk.chunk_id_for_vector, DocumentChunk.chunk_index
+                ).filter(DocumentChunk.document_id == document_id)
+            }
             
-            # Step 3: Generate embeddings
-            logger.info(f"Generating embeddings for {len(chunks)} chunks")
-            chunk_texts = [chunk["chunk_text"] for chunk in chunks]
-            embeddings = self.embedding_service.generate_embeddings_batch(chunk_texts)
+            logger.info(f"Processing document {document_id}: {document.filename} ({len(existing)} chunks stored)")
+            file_path = self.storage.get_file_path(document.storage_path)
+            checkpoint = ParseCheckpoint(document_id, file_path, document.storage_path)
+            state = {
+                "head": "", "text_length": 0, "chunks": 0, "seen": set(), "reused": [],
+                "segments_reused": 0, "error": None, "retryable": True
+            }
+            batches = queue.Queue(maxsize=settings.PIPELINE_QUEUE_SIZE)
+            embedded = queue.Queue(maxsize=settings.PIPELINE_QUEUE_SIZE)
+            stages = [
+                threading.Thread(
+                    target=self._produce,
+                    args=(file_path, document.mime_type, document_id, existing, checkpoint, batches, abort, state),
+                    name=f"parse-{document_id}", daemon=True
+                ),
+                threading.Thread(
+                    target=self._embed,
+                    args=(batches, embedded, abort, state),
+                    name=f"embed-{document_id}", daemon=True
+                )
+            ]
+            for stage in stages:
+                stage.start()
             
-            # Filter out failed embeddings
-            valid_chunks = []
-            valid_embeddings = []
-            for chunk, embedding in zip(chunks, embeddings):
-                if embedding is not None:
-                    valid_chunks.append(chunk)
-                    valid_embeddings.append(embedding)
+            failed_indexes = []
+            tokens = 0
+            while True:
+                item = _get(embedded, abort)
+                if item is _DONE:
+                    break
+                chunks, embeddings = item
+                valid = [(chunk, embedding) for chunk, embedding in zip(chunks, embeddings) if embedding is not None]
+                failed_indexes.extend(chunk["chunk_index"] for chunk, embedding in zip(chunks, embeddings) if embedding is None)
+                if not valid:
+                    continue
+                first = not added
+                # Recorded before writing, so a half-written batch is cleaned up too
+                added.extend(chunk["chunk_id"] for chunk, _ in valid)
+                self._store(db, document, [chunk for chunk, _ in valid], [embedding for _, embedding in valid])
+                stored = len(added)
+                if first:
+                    # Make the first chunks visible to search right away
+                    bump_index_generation(db, company_id)
+                    logger.info(f"Document {document_id}: first {len(valid)} new chunks searchable")
+                tokens += sum(chunk.get("token_count", 0) for chunk, _ in valid)
+            for stage in stages:
+                stage.join()
             
-            if not valid_chunks:
-                document.status = "error"
-                db.commit()
-                return {"success": False, "error": "Failed to generate embeddings"}
+            if state["error"]:
+                return self._fail(db, document_id, state["error"], state["retryable"], company_id, added, stored)
+            if state["chunks"] == 0:
+                return self._fail(db, document_id, "No chunks created", False, company_id, added, stored)
             
-            # Step 4: Store in database
-            logger.info(f"Storing {len(valid_chunks)} chunks in database")
-            for chunk in valid_chunks:
-                db_chunk = DocumentChunk(
-                    document_id=document_id,
-                    company_id=document.company_id,
-                    chunk_text=chunk["chunk_text"],
-                    chunk_index=chunk["chunk_index"],
-                    chunk_id_for_vector=chunk["chunk_id"]
+            if state["segments_reused"]:
+                logger.info(f"Document {document_id}: resumed after {state['segments_reused']} checkpointed segments")
+            if failed_indexes:
+                # Stored chunks and the checkpoint are kept: a retry embeds only the missing ones
+                logger.warning(
+                    f"Document {document_id}: {len(failed_indexes)} of {state['chunks']} chunks "
+                    f"failed to embed after retries (chunk indexes {failed_indexes[:20]})"
                 )
-                db.add(db_chunk)
+                error = f"{len(failed_indexes)} of {state['chunks']} chunks failed to embed"
+                return self._fail(db, document_id, error, True, company_id, added, stored)
             
-            # Step 5: Store in vector database
-            logger.info(f"Storing embeddings in vector database")
-            chunk_ids = [chunk["chunk_id"] for chunk in valid_chunks]
-            metadatas = [
-                {
-                    "document_id": document_id,
-                    "company_id": document.company_id,
-                    "chunk_index": chunk["chunk_index"],
-                    "filename": document.filename
-                }
-                for chunk in valid_chunks
-            ]
+            reconciled = self._reconcile(db, document, existing, state)
             
-            success = self.vector_db.add_chunks(
-                chunk_ids=chunk_ids,
-                embeddings=valid_embeddings,
-                texts=chunk_texts,
-                metadatas=metadatas
-            )
-            
-            if not success:
-                document.status = "error"
-                db.commit()
-                return {"success": False, "error": "Failed to store in vector DB"}
-            
-            # Step 6: Generate summary (first 500 chars)
-            summary = text[:500] + "..." if len(text) > 500 else text
-            document.summary = summary
+            # Summary (first 500 chars)
+            head = state["head"]
+            document.summary = head[:SUMMARY_CHARS] + "..." if state["text_length"] > SUMMARY_CHARS else head
             
             # Update document status
             document.status = "processed"
             document.processed_at = datetime.utcnow()
             db.commit()
+            bump_index_generation(db, company_id)
+            discard_checkpoint(document_id)
             
-            logger.info(f"Successfully processed document {document_id}")
+            logger.info(
+                f"Successfully processed document {document_id}: {len(added)} chunks embedded, "
+                f"{reconciled['kept']} kept, {reconciled['deleted']} deleted"
+            )
             return {
                 "success": True,
-                "chunks_created": len(valid_chunks),
-                "total_tokens": sum(chunk.get("token_count", 0) for chunk in valid_chunks)
+                "chunks_created": len(added),
+                "chunks_kept": reconciled["kept"],
+                "chunks_deleted": reconciled["deleted"],
+                "segments_reused": state["segments_reused"],
+                "total_tokens": tokens
             }
-            
+        
         except Exception as e:
             logger.error(f"Error processing document {document_id}: {e}")
-            
-            # Update status to error
-            try:
-                document = db.query(Document).filter(Document.id == document_id).first()
-                if document:
-                    document.status = "error"
-                    db.commit()
-            except:
-                pass
-            
-            return {"success": False, "error": str(e)}
+            abort.set()
+            for stage in stages:
+                stage.join()
+            return self._fail(db, document_id, str(e), True, company_id, added, stored)
+
+def discard_failed_document(db: Session, document_id: int, company_id: int):
+    """
+    Remove what retryable failures kept for the next attempt once a document
+    has failed for good: its chunks (vector store and Postgres, so nothing
+    of it stays searchable) and its parse checkpoint
+    """
+    if not get_vector_db().delete_by_document(document_id, company_id):
+        raise RuntimeError("Failed to delete from vector DB")
+    db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).delete(synchronize_session=False)
+    db.commit()
+    discard_checkpoint(document_id)
+    bump_index_generation(db, company_id)
 
 # Singleton
 _processor = None
@@ -157,4 +400,4 @@ def get_document_processor() -> DocumentProcessor:
     global _processor
     if _processor is None:
         _processor = DocumentProcessor()
-    return _processor
\ No newline at end of file
+    return _processor
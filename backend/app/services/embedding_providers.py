@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import logging
+import math
+import re
+from abc import ABC, abstractmethod
+from typing import List
+import httpx
+import numpy as np
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingProvider(ABC):
+    """Backend that turns texts into fixed-size vectors"""
+    
+    # Identifies the vector space; part of embedding cache keys
+    model_name: str = ""
+    dimension: int = 768
+    # Largest number of texts accepted by one embed() call
+    max_batch_size: int = 100
+    # Remote providers are paced by the service's token bucket
+    rate_limited: bool = False
+    
+    @abstractmethod
+    def embed(self, texts: List[str], task_type: str) -> List[List[float]]:
+        """Embed texts in one call, raising on failure"""
+    
+    async def embed_async(self, texts: List[str], task_type: str) -> List[List[float]]:
+        """Async variant of embed(); defaults to running embed() on a worker thread"""
+        return await asyncio.to_thread(self.embed, texts, task_type)
+    
+    def is_retryable(self, error: Exception) -> bool:
+        """Whether a failed call is worth retrying with backoff"""
+        return False
+    
+    async def aclose(self):
+        """Release async resources"""
+
+class GeminiEmbeddingProvider(EmbeddingProvider):
+    """Google Gemini embedding API (SDK for sync calls, REST over httpx for async)"""
+    
+    API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+    max_batch_size = 100  # batchEmbedContents limit
+    rate_limited = True
+    
+    def __init__(self, model_name: str, dimension: int = 768):
+        import google.generativeai as genai
+        self._genai = genai
+        self.model_name = model_name
+        self.dimension = dimension
+        self._async_client = None
+        try:
+            genai.configure(api_key=settings.GEMINI_API_KEY)
+            logger.info("Gemini API configured successfully")
+        except Exception as e:
+            logger.error(f"Failed to configure Gemini API: {e}")
+    
+    def embed(self, texts: List[str], task_type: str) -> List[List[float]]:
+        result = self._genai.embed_content(
+            model=self.model_name,
+            content=texts,
+            task_type=task_type
+        )
+        return result['embedding']
+    
+    def _get_async_client(self) -> httpx.AsyncClient:
+        # One pooled client shared by every in-flight request
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+            )
+        return self._async_client
+    
+    async def embed_async(self, texts: List[str], task_type: str) -> List[List[float]]:
+        response = await self._get_async_client().post(
+            f"{self.API_BASE}/{self.model_name}:batchEmbedContents",
+            # In a header, not the URL: httpx errors (which get logged) include the URL
+            headers={"x-goog-api-key": settings.GEMINI_API_KEY},
+            json={
+                "requests": [
+                    {
+                        "model": self.model_name,
+                        "content": {"parts": [{"text": text}]},
+                        "taskType": task_type.upper()
+                    }
+                    for text in texts
+                ]
+            }
+        )
+        response.raise_for_status()
+        return [embedding["values"] for embedding in response.json()["embeddings"]]
+    
+    def is_retryable(self, error: Exception) -> bool:
+        """True for rate limiting (429), server side (5xx) and network errors"""
+        response = getattr(error, "response", None)
+        code = getattr(response, "status_code", None) or getattr(error, "code", None)
+        if isinstance(code, int):
+            return code == 429 or 500 <= code < 600
+        return isinstance(error, (ConnectionError, TimeoutError, httpx.TransportError))
+    
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    Offline, deterministic embeddings from hashed features: words, word
+    bigrams and character trigrams are hashed into `dimension` signed
+    buckets with sublinear term frequency, then L2-normalized.
+    Far weaker than a trained model, but needs no network and is fast
+    enough for throughput benchmarks and running without the remote API.
+    """
+    
+    max_batch_size = 1000
+    
+    TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+    
+    # Relative weight of each feature kind
+    FEATURE_WEIGHTS = {"w": 1.0, "b": 0.5, "c": 0.25}
+    
+    def __init__(self, dimension: int = 768):
+        self.dimension = dimension
+        self.model_name = f"local-hash-{dimension}"
+    
+    def _bucket(self, feature: str):
+        """Stable hash of a feature to (index, sign)"""
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dimension, 1.0 if value >> 63 else -1.0
+    
+    def _features(self, text: str) -> dict:
+        """Count word, word bigram and character trigram features"""
+        tokens = self.TOKEN_PATTERN.findall(text.lower())
+        counts = {}
+        for i, token in enumerate(tokens):
+            features = ["w:" + token]
+            if i > 0:
+                features.append(f"b:{tokens[i - 1]} {token}")
+            padded = f"#{token}#"
+            features.extend("c:" + padded[j:j + 3] for j in range(len(padded) - 2))
+            for feature in features:
+                counts[feature] = counts.get(feature, 0) + 1
+        return counts
+    
+    def embed_one(self, text: str) -> List[float]:
+        """Embed a single text"""
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for feature, count in self._features(text).items():
+            index, sign = self._bucket(feature)
+            vector[index] += sign * self.FEATURE_WEIGHTS[feature[0]] * (1.0 + math.log(count))
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+    
+    def embed(self, texts: List[str], task_type: str) -> List[List[float]]:
+        # Symmetric model: documents and queries share one space
+        return [self.embed_one(text) for text in texts]
+
+def get_embedding_provider(name: str = None) -> EmbeddingProvider:
+    """Build the provider selected by EMBEDDING_PROVIDER"""
+    name = (name or settings.EMBEDDING_PROVIDER).lower()
+    if name == "gemini":
+        return GeminiEmbeddingProvider(settings.EMBEDDING_MODEL, settings.EMBEDDING_DIMENSION)
+    if name == "local":
+        return LocalEmbeddingProvider(settings.EMBEDDING_DIMENSION)
+    raise ValueError(f"Unknown embedding provider: {name}")
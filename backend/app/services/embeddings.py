@@ -1,51 +1,299 @@
+import asyncio
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
-import google.generativeai as genai
 from app.core.config import settings
+from app.services.embedding_providers import EmbeddingProvider, get_embedding_provider
+from app.utils.cache import AsyncSingleFlight, LRUCache, SingleFlight
+from app.utils.embedding_cache import EmbeddingCache
+from app.utils.rate_limit import TokenBucket, backoff_delay
 
 logger = logging.getLogger(__name__)
 
 class EmbeddingService:
-    """Google Gemini embedding service"""
+    """Embedding service: caching, batching and retries around an EmbeddingProvider"""
     
-    def __init__(self):
-        self.embedding_dim = 768
-        try:
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            logger.info("Gemini API configured successfully")
-        except Exception as e:
-            logger.error(f"Failed to configure Gemini API: {e}")
+    def __init__(self, provider: Optional[EmbeddingProvider] = None):
+        self.provider = provider or get_embedding_provider()
+        self.embedding_dim = self.provider.dimension
+        self.model = self.provider.model_name
+        self.batch_size = min(settings.EMBEDDING_BATCH_SIZE, self.provider.max_batch_size)
+        self.batch_max_tokens = settings.EMBEDDING_BATCH_MAX_TOKENS
+        self.max_retries = settings.EMBEDDING_MAX_RETRIES
+        
+        # Every worker shares the provider's client (and its connection pool);
+        # the bucket keeps the process inside its share of the provider quota
+        shares = settings.EMBEDDING_QUOTA_SHARES or settings.JOB_WORKER_PROCESSES + 1
+        requests_per_second = settings.EMBEDDING_REQUESTS_PER_MINUTE / 60 / max(1, shares)
+        self.rate_limiter = TokenBucket(
+            rate=requests_per_second,
+            capacity=max(1, settings.EMBEDDING_MAX_WORKERS)
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.EMBEDDING_MAX_WORKERS,
+            thread_name_prefix="embedding"
+        )
+        
+        # Hot query embeddings stay in memory; identical in-flight queries share one call
+        self.query_cache = LRUCache(
+            max_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+            ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS
+        )
+        self._query_flights = SingleFlight()
+        self._async_query_flights = AsyncSingleFlight()
+        
+        self.cache = None
+        if settings.EMBEDDING_CACHE_ENABLED:
+            try:
+                self.cache = EmbeddingCache(
+                    settings.EMBEDDING_CACHE_PATH,
+                    max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES
+                )
+            except Exception as e:
+                logger.error(f"Embedding cache unavailable, continuing without it: {e}")
+        
+        logger.info(f"Embedding service using {self.model} ({self.embedding_dim} dims)")
     
     def generate_embedding(self, text: str, task_type: str = "retrieval_document") -> Optional[List[float]]:
         """
         Generate embedding for text
         task_type: 'retrieval_document' for docs, 'retrieval_query' for search queries
         """
+        cache_key = None
+        if self.cache:
+            cache_key = EmbeddingCache.make_key(text, self.model, task_type)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         try:
-            result = genai.embed_content(
-                model="models/embedding-001",
-                content=text,
-                task_type=task_type
-            )
-            embedding = result['embedding']
+            embedding = self._request_embeddings([text], task_type)[0]
             logger.info(f"Generated embedding for text ({len(text)} chars)")
+            if cache_key:
+                self.cache.set(cache_key, embedding)
             return embedding
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
             return None
     
+    def _request_embeddings(self, texts: List[str], task_type: str) -> List[List[float]]:
+        """
+        Single provider call, paced by the token bucket and retried with
+        exponential backoff and jitter on retryable errors
+        """
+        attempt = 0
+        while True:
+            if self.provider.rate_limited:
+                self.rate_limiter.acquire()
+            try:
+                return self.provider.embed(texts, task_type)
+            except Exception as e:
+                if not self.provider.is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(
+                    attempt,
+                    base=settings.EMBEDDING_BACKOFF_BASE_SECONDS,
+                    maximum=settings.EMBEDDING_BACKOFF_MAX_SECONDS
+                )
+                logger.warning(f"Embedding request failed ({e}), retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+    
+    async def _request_embeddings_async(self, texts: List[str], task_type: str) -> List[List[float]]:
+        """Async provider call with the same pacing and retry policy as _request_embeddings"""
+        attempt = 0
+        while True:
+            if self.provider.rate_limited:
+                await self.rate_limiter.acquire_async()
+            try:
+                return await self.provider.embed_async(texts, task_type)
+            except Exception as e:
+                if not self.provider.is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(
+                    attempt,
+                    base=settings.EMBEDDING_BACKOFF_BASE_SECONDS,
+                    maximum=settings.EMBEDDING_BACKOFF_MAX_SECONDS
+                )
+                logger.warning(f"Embedding request failed ({e}), retry {attempt + 1} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+    
+    async def generate_embedding_async(self, text: str, task_type: str = "retrieval_document") -> Optional[List[float]]:
+        """Async variant of generate_embedding that never blocks the event loop"""
+        cache_key = None
+        if self.cache:
+            cache_key = EmbeddingCache.make_key(text, self.model, task_type)
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                return cached
+        
+        try:
+            embedding = (await self._request_embeddings_async([text], task_type))[0]
+            logger.info(f"Generated embedding for text ({len(text)} chars)")
+            if cache_key:
+                await asyncio.to_thread(self.cache.set, cache_key, embedding)
+            return embedding
+        except Exception as e:
+            logger.error(f"Error generating embedding: {e}")
+            return None
+    
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Cheap token estimate (~4 chars per token) used for batch packing"""
+        return len(text) // 4 + 1
+    
+    def _pack_batches(self, texts: List[str]) -> List[List[int]]:
+        """
+        Group text indices into request batches bounded by both
+        EMBEDDING_BATCH_SIZE and EMBEDDING_BATCH_MAX_TOKENS
+        """
+        batches = []
+        current = []
+        current_tokens = 0
+        
+        for i, text in enumerate(texts):
+            tokens = self.estimate_tokens(text)
+            if current and (
+                len(current) >= self.batch_size
+                or current_tokens + tokens > self.batch_max_tokens
+            ):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(i)
+            current_tokens += tokens
+        
+        if current:
+            batches.append(current)
+        return batches
+    
+    def _embed_batch(self, texts: List[str], task_type: str) -> List[Optional[List[float]]]:
+        """
+        Embed a packed batch with a single provider request.
+        If the request is rejected the batch is split in half and each half
+        is retried, so only the items that really fail come back as None.
+        """
+        try:
+            embeddings = self._request_embeddings(texts, task_type)
+            if len(embeddings) != len(texts):
+                raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+            return embeddings
+        except Exception as e:
+            if len(texts) == 1:
+                logger.error(f"Error generating embedding: {e}")
+                return [None]
+            if self.provider.is_retryable(e):
+                # Retries are exhausted; splitting would only add load
+                logger.error(f"Embedding batch of {len(texts)} failed after retries: {e}")
+                return [None] * len(texts)
+            logger.warning(f"Embedding batch of {len(texts)} failed ({e}), retrying in halves")
+            mid = len(texts) // 2
+            return self._embed_batch(texts[:mid], task_type) + self._embed_batch(texts[mid:], task_type)
+    
     def generate_embeddings_batch(self, texts: List[str], task_type: str = "retrieval_document") -> List[Optional[List[float]]]:
-        """Generate embeddings for multiple texts"""
-        embeddings = []
-        for text in texts:
-            embedding = self.generate_embedding(text, task_type)
-            embeddings.append(embedding)
-        logger.info(f"Generated {len(embeddings)} embeddings")
+        """
+        Generate embeddings for multiple texts, packing many texts into each
+        provider request. Result order matches input; failed items are None.
+        """
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        
+        # Empty texts are rejected by the API, don't let them poison a batch
+        pending = [i for i, text in enumerate(texts) if text and text.strip()]
+        
+        # Serve what we already embedded from the cache
+        keys = {}
+        if self.cache and pending:
+            keys = {i: EmbeddingCache.make_key(texts[i], self.model, task_type) for i in pending}
+            cached = self.cache.get_many(list(keys.values()))
+            for i in pending:
+                embeddings[i] = cached.get(keys[i])
+            pending = [i for i in pending if embeddings[i] is None]
+        
+        # Embed repeated texts (boilerplate headers, footers) only once
+        duplicates = {}
+        if keys:
+            first_index = {}
+            unique = []
+            for i in pending:
+                if keys[i] in first_index:
+                    duplicates[i] = first_index[keys[i]]
+                else:
+                    first_index[keys[i]] = i
+                    unique.append(i)
+            pending = unique
+        
+        batches = self._pack_batches([texts[i] for i in pending])
+        
+        # Run batch requests concurrently on the shared bounded pool
+        futures = []
+        for batch in batches:
+            indices = [pending[j] for j in batch]
+            future = self.executor.submit(self._embed_batch, [texts[i] for i in indices], task_type)
+            futures.append((indices, future))
+        
+        for indices, future in futures:
+            batch_embeddings = future.result()
+            for i, embedding in zip(indices, batch_embeddings):
+                embeddings[i] = embedding
+            
+            if self.cache:
+                self.cache.set_many({
+                    keys[i]: embedding
+                    for i, embedding in zip(indices, batch_embeddings)
+                    if embedding is not None
+                })
+        
+        for i, source in duplicates.items():
+            embeddings[i] = embeddings[source]
+        
+        succeeded = sum(1 for e in embeddings if e is not None)
+        logger.info(f"Generated {succeeded}/{len(texts)} embeddings in {len(batches)} batch requests")
         return embeddings
     
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Normalize a search query for cache lookups"""
+        return " ".join(query.lower().split())
+    
     def generate_query_embedding(self, query: str) -> Optional[List[float]]:
-        """Generate embedding for search query"""
-        return self.generate_embedding(query, task_type="retrieval_query")
+        """Generate embedding for search query, served from the query cache when possible"""
+        key = self.normalize_query(query)
+        embedding = self.query_cache.get(key)
+        if embedding is not None:
+            return embedding
+        
+        def load():
+            # Another request may have filled the cache while we waited for the flight
+            cached = self.query_cache.get(key)
+            if cached is not None:
+                return cached
+            result = self.generate_embedding(key, task_type="retrieval_query")
+            if result is not None:
+                self.query_cache.set(key, result)
+            return result
+        
+        return self._query_flights.do(key, load)
+    
+    async def generate_query_embedding_async(self, query: str) -> Optional[List[float]]:
+        """Async generate_query_embedding; concurrent identical queries share one call"""
+        key = self.normalize_query(query)
+        embedding = self.query_cache.get(key)
+        if embedding is not None:
+            return embedding
+        
+        async def load():
+            result = await self.generate_embedding_async(key, task_type="retrieval_query")
+            if result is not None:
+                self.query_cache.set(key, result)
+            return result
+        
+        return await self._async_query_flights.do(key, load)
+    
+    async def aclose(self):
+        """Close provider connections"""
+        await self.provider.aclose()
 
 # Singleton instance
 _embedding_service = None
@@ -55,4 +303,9 @@ def get_embedding_service() -> EmbeddingService:
     global _embedding_service
     if _embedding_service is None:
         _embedding_service = EmbeddingService()
-    return _embedding_service
\ No newline at end of file
+    return _embedding_service
+
+async def close_embedding_service():
+    """Release the embedding service's connections (no-op if it was never created)"""
+    if _embedding_service is not None:
+        await _embedding_service.aclose()
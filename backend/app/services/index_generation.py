@@ -0,0 +1,28 @@
+import logging
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from app.models.models import Company
+
+logger = logging.getLogger(__name__)
+
+def get_index_generation(db: Session, company_id: int) -> int:
+    """
+    Current index generation of a company. It changes whenever the company's
+    searchable corpus changes, so caches keyed on it invalidate exactly then.
+    Stored in Postgres so processing workers and the API agree on it.
+    """
+    generation = db.query(Company.index_generation).filter(Company.id == company_id).scalar()
+    return generation or 0
+
+def bump_index_generation(db: Session, company_id: int) -> None:
+    """Mark a company's corpus as changed (commits)"""
+    try:
+        db.execute(
+            update(Company)
+            .where(Company.id == company_id)
+            .values(index_generation=func.coalesce(Company.index_generation, 0) + 1)
+        )
+        db.commit()
+    except Exception as e:
+        logger.error(f"Failed to bump index generation for company {company_id}: {e}")
+        db.rollback()
@@ -0,0 +1,226 @@
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import and_, exists, func, or_, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, aliased
+from app.core.config import settings
+from app.models.models import Document, ProcessingJob
+
+logger = logging.getLogger(__name__)
+
+# Predicate of the partial unique index idx_processing_jobs_queued_document
+QUEUED_JOB = text("status = 'queued'")
+
+def enqueue_documents(db: Session, company_id: int, document_ids: List[int]) -> None:
+    """
+    Queue documents for processing (commits). Documents that already have a
+    queued job are left alone; a document being processed gets a follow-up
+    job, so a new version uploaded meanwhile is indexed too.
+    """
+    if not document_ids:
+        return
+    now = datetime.utcnow()
+    db.execute(
+        insert(ProcessingJob)
+        .values([
+            {
+                "document_id": document_id,
+                "company_id": company_id,
+                "status": "queued",
+                "attempts": 0,
+                "max_attempts": settings.JOB_MAX_ATTEMPTS,
+                "run_after": now,
+                "created_at": now
+            }
+            for document_id in document_ids
+        ])
+        .on_conflict_do_nothing(index_elements=["document_id"], index_where=QUEUED_JOB)
+    )
+    db.query(Document).filter(
+        Document.id.in_(document_ids),
+        Document.status.in_(("uploaded", "error"))
+    ).update({"status": "queued"}, synchronize_session=False)
+    db.commit()
+
+def claim_job(db: Session, worker_id: str) -> Optional[Dict]:
+    """
+    Lease the next due job (commits). Queued jobs are due once their
+    run_after passes; running jobs whose lease lapsed (worker died) are
+    reclaimed. Concurrent workers skip each other's locked rows, and a
+    document is never processed by two workers at once.
+    """
+    other = aliased(ProcessingJob)
+    document_busy = exists().where(
+        other.document_id == ProcessingJob.document_id,
+        other.status == "running",
+        other.id != ProcessingJob.id
+    )
+    while True:
+        now = datetime.utcnow()
+        job = db.query(ProcessingJob).filter(
+            or_(
+                and_(ProcessingJob.status == "queued", ProcessingJob.run_after <= now, ~document_busy),
+                and_(ProcessingJob.status == "running", ProcessingJob.lease_expires_at < now)
+            )
+        ).order_by(
+            ProcessingJob.run_after, ProcessingJob.id
+        ).with_for_update(skip_locked=True).first()
+        
+        if job is None:
+            db.rollback()
+            return None
+        
+        if job.status == "running" and job.attempts >= job.max_attempts:
+            # Lost its worker on every attempt; likely crashes the process
+            logger.error(f"Job {job.id} (document {job.document_id}) abandoned by {job.locked_by}; giving up")
+            error = f"Worker {job.locked_by} stopped heartbeating"
+            if not _supersede(db, job, error):
+                _finish(db, job, "failed", error)
+            continue
+        
+        if job.status == "running":
+            logger.warning(f"Reclaiming job {job.id} from {job.locked_by} (lease expired)")
+        job.status = "running"
+        job.locked_by = worker_id
+        job.attempts += 1
+        job.started_at = now
+        job.lease_expires_at = now + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+        db.commit()
+        return {
+            "id": job.id,
+            "document_id": job.document_id,
+            "company_id": job.company_id,
+            "attempts": job.attempts,
+            "max_attempts": job.max_attempts
+        }
+
+def heartbeat(db: Session, job_id: int, worker_id: str) -> bool:
+    """Extend a job's lease (commits). False if the lease was lost"""
+    renewed = db.query(ProcessingJob).filter(
+        ProcessingJob.id == job_id,
+        ProcessingJob.locked_by == worker_id,
+        ProcessingJob.status == "running"
+    ).update(
+        {"lease_expires_at": datetime.utcnow() + timedelta(seconds=settings.JOB_LEASE_SECONDS)},
+        synchronize_session=False
+    )
+    db.commit()
+    return renewed == 1
+
+def _leased_job(db: Session, job_id: int, worker_id: str) -> Optional[ProcessingJob]:
+    """The job if this worker still holds its lease"""
+    return db.query(ProcessingJob).filter(
+        ProcessingJob.id == job_id,
+        ProcessingJob.locked_by == worker_id,
+        ProcessingJob.status == "running"
+    ).with_for_update().first()
+
+def _finish(db: Session, job: ProcessingJob, status: str, error: Optional[str] = None):
+    job.status = status
+    job.last_error = error
+    job.lease_expires_at = None
+    job.finished_at = datetime.utcnow()
+    if status == "failed":
+        db.query(Document).filter(Document.id == job.document_id).update(
+            {"status": "error"}, synchronize_session=False
+        )
+    db.commit()
+    if status == "failed":
+        # Out of attempts: drop the partial index kept for retries
+        from app.services.document_processor import discard_failed_document
+        try:
+            discard_failed_document(db, job.document_id, job.company_id)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Could not discard partial index of document {job.document_id}: {e}")
+
+def _supersede(db: Session, job: ProcessingJob, error: str) -> bool:
+    """
+    End a failed job in favor of a follow-up job queued for the same
+    document (commits). False if there is none.
+    """
+    follow_up = db.query(ProcessingJob.id).filter(
+        ProcessingJob.document_id == job.document_id,
+        ProcessingJob.status == "queued"
+    ).first()
+    if follow_up is None:
+        return False
+    logger.info(f"Job {job.id} failed ({error}); job {follow_up.id} processes document {job.document_id} next")
+    db.query(Document).filter(Document.id == job.document_id).update(
+        {"status": "queued"}, synchronize_session=False
+    )
+    _finish(db, job, "superseded", error)
+    return True
+
+def complete_job(db: Session, job_id: int, worker_id: str) -> None:
+    """Mark a job done (commits)"""
+    job = _leased_job(db, job_id, worker_id)
+    if job is None:
+        logger.warning(f"Job {job_id} finished after {worker_id} lost its lease")
+        db.rollback()
+        return
+    _finish(db, job, "done")
+
+def fail_job(db: Session, job_id: int, worker_id: str, error: str, retryable: bool = True) -> bool:
+    """
+    Record a failed attempt (commits). Retryable failures are re-queued with
+    exponential backoff and jitter until max_attempts. A job whose document
+    already has a follow-up job queued ends as superseded instead: only one
+    queued job per document is allowed, and the follow-up does the retry.
+    Returns True if the document will be processed again.
+    """
+    job = _leased_job(db, job_id, worker_id)
+    if job is None:
+        logger.warning(f"Job {job_id} failed after {worker_id} lost its lease: {error}")
+        db.rollback()
+        return False
+    
+    if _supersede(db, job, error):
+        return True
+    
+    if not retryable or job.attempts >= job.max_attempts:
+        _finish(db, job, "failed", error)
+        return False
+    
+    delay = min(
+        settings.JOB_BACKOFF_BASE_SECONDS * (2 ** (job.attempts - 1)),
+        settings.JOB_BACKOFF_MAX_SECONDS
+    )
+    delay *= random.uniform(0.5, 1.0)
+    job.status = "queued"
+    job.last_error = error
+    job.locked_by = None
+    job.lease_expires_at = None
+    job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+    db.query(Document).filter(Document.id == job.document_id).update(
+        {"status": "queued"}, synchronize_session=False
+    )
+    db.commit()
+    logger.info(f"Job {job_id} attempt {job.attempts}/{job.max_attempts} failed, retrying in {delay:.0f}s: {error}")
+    return True
+
+def get_document_job(db: Session, document_id: int) -> Optional[Dict]:
+    """Latest job of a document"""
+    job = db.query(ProcessingJob).filter(
+        ProcessingJob.document_id == document_id
+    ).order_by(ProcessingJob.id.desc()).first()
+    if job is None:
+        return None
+    return {
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "run_after": job.run_after,
+        "last_error": job.last_error
+    }
+
+def queue_depth(db: Session) -> Dict[str, int]:
+    """Number of queued and running jobs"""
+    rows = db.query(ProcessingJob.status, func.count(ProcessingJob.id)).filter(
+        ProcessingJob.status.in_(("queued", "running"))
+    ).group_by(ProcessingJob.status).all()
+    depth = {"queued": 0, "running": 0}
+    depth.update({status: count for status, count in rows})
+    return depth
@@ -0,0 +1,77 @@
+import logging
+from datetime import datetime, timezone
+from typing import List, Dict, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.models import Document, DocumentChunk
+
+logger = logging.getLogger(__name__)
+
+# Must match the configuration of the doc_chunks.chunk_tsv generated column
+TS_CONFIG = "english"
+
+def to_naive_utc(value: datetime) -> datetime:
+    """Convert to the naive UTC datetimes stored in Postgres"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+class LexicalSearch:
+    """Postgres full-text search over doc_chunks (tsvector + GIN index)"""
+    
+    def search(
+        self,
+        db: Session,
+        query: str,
+        company_id: int,
+        n_results: int = 5,
+        file_type: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None
+    ) -> List[Dict]:
+        """
+        Rank a company's chunks against the query.
+        Returns candidates best first with a 0-1 score.
+        """
+        ts_query = func.websearch_to_tsquery(TS_CONFIG, query)
+        # Normalization 32 maps rank into 0-1 as rank / (rank + 1)
+        rank = func.ts_rank_cd(DocumentChunk.chunk_tsv, ts_query, 32).label("rank")
+        
+        q = db.query(
+            DocumentChunk.chunk_id_for_vector,
+            DocumentChunk.document_id,
+            DocumentChunk.chunk_index,
+            DocumentChunk.chunk_text,
+            rank
+        ).join(Document, Document.id == DocumentChunk.document_id).filter(
+            DocumentChunk.company_id == company_id,
+            DocumentChunk.chunk_tsv.op("@@")(ts_query)
+        )
+        
+        if file_type:
+            q = q.filter(Document.file_type == file_type.lower().lstrip('.'))
+        if date_from:
+            q = q.filter(Document.created_at >= to_naive_utc(date_from))
+        if date_to:
+            q = q.filter(Document.created_at <= to_naive_utc(date_to))
+        
+        rows = q.order_by(rank.desc()).limit(n_results).all()
+        
+        return [
+            {
+                "chunk_id": row.chunk_id_for_vector,
+                "document_id": row.document_id,
+                "chunk_index": row.chunk_index,
+                "chunk_text": row.chunk_text,
+                "score": float(row.rank)
+            }
+            for row in rows
+        ]
+
+_lexical_search = None
+
+def get_lexical_search() -> LexicalSearch:
+    global _lexical_search
+    if _lexical_search is None:
+        _lexical_search = LexicalSearch()
+    return _lexical_search
@@ -0,0 +1,172 @@
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import insert
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import ActivityLog, SearchHistory
+
+logger = logging.getLogger(__name__)
+
+class BatchedLogWriter:
+    """
+    Buffers SearchHistory and ActivityLog rows in memory and writes them from
+    a background thread with multi-row inserts, every `flush_interval_ms` or
+    as soon as `batch_size` rows are waiting. Keeps logging commits off the
+    request path. Rows are dropped (and counted) when the buffer is full.
+    """
+    
+    def __init__(self, batch_size: int = 500, flush_interval_ms: int = 200, max_queue_size: int = 50000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_depth = 0
+    
+    def start(self):
+        """Start the flush thread (idempotent)"""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+    
+    def _enqueue(self, model, row: Dict):
+        if self._thread is None:
+            self.start()
+        row.setdefault("timestamp", datetime.utcnow())
+        try:
+            self._queue.put_nowait((model, row))
+        except queue.Full:
+            self.dropped += 1
+            return
+        self.enqueued += 1
+        depth = self._queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if depth >= self.batch_size:
+            self._wakeup.set()
+    
+    def log_search(self, user_id: int, company_id: int, query_text: str, results_meta: Dict):
+        """Queue a search history row"""
+        self._enqueue(SearchHistory, {
+            "user_id": user_id,
+            "company_id": company_id,
+            "query_text": query_text,
+            "results_meta": results_meta
+        })
+    
+    def log_activity(self, user_id: Optional[int], company_id: Optional[int], action: str, details: Dict = None):
+        """Queue an activity log row"""
+        self._enqueue(ActivityLog, {
+            "user_id": user_id,
+            "company_id": company_id,
+            "action": action,
+            "details": details or {}
+        })
+    
+    def _drain(self) -> List:
+        """Take up to batch_size queued rows"""
+        items = []
+        while len(items) < self.batch_size:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+    
+    def _write(self, items: List):
+        """Insert a batch, one executemany per table"""
+        grouped = {}
+        for model, row in items:
+            grouped.setdefault(model, []).append(row)
+        
+        start = time.perf_counter()
+        db = SessionLocal()
+        try:
+            for model, rows in grouped.items():
+                db.execute(insert(model), rows)
+            db.commit()
+            self.written += len(items)
+        except Exception as e:
+            db.rollback()
+            self.failed += len(items)
+            logger.error(f"Failed to write {len(items)} log rows: {e}")
+        finally:
+            db.close()
+        self.flushes += 1
+        self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+    
+    def flush(self):
+        """Write everything currently queued"""
+        while True:
+            items = self._drain()
+            if not items:
+                return
+            self._write(items)
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+        # Final drain after stop() so nothing accepted is lost
+        self.flush()
+    
+    def stop(self, timeout: float = 10.0):
+        """Flush pending rows and stop the thread"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning(f"Log writer did not finish within {timeout}s; {self._queue.qsize()} rows pending")
+            self._thread = None
+        # Rows queued after the thread exited
+        self.flush()
+    
+    def stats(self) -> Dict:
+        """Queue depth and throughput counters"""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_depth,
+            "queue_capacity": self._queue.maxsize,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "last_flush_ms": self.last_flush_ms
+        }
+
+# Singleton instance
+_log_writer = None
+
+def get_log_writer() -> BatchedLogWriter:
+    """Get batched log writer instance"""
+    global _log_writer
+    if _log_writer is None:
+        _log_writer = BatchedLogWriter(
+            batch_size=settings.LOG_WRITER_BATCH_SIZE,
+            flush_interval_ms=settings.LOG_WRITER_FLUSH_INTERVAL_MS,
+            max_queue_size=settings.LOG_WRITER_MAX_QUEUE
+        )
+    return _log_writer
+
+def shutdown_log_writer():
+    """Flush and stop the writer (no-op if it was never created)"""
+    if _log_writer is not None:
+        _log_writer.stop()
@@ -0,0 +1,97 @@
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Last line of a checkpoint whose document was parsed completely
+_PARSED = {"stage": "parsed"}
+
+class ParseCheckpoint:
+    """
+    Parsed segments of one document version, appended as JSON lines to
+    STORAGE_PATH/checkpoints/document_<id>.jsonl as parsing goes. A retry
+    reads them back instead of parsing the file again. The first line
+    identifies the file version and chunking settings; a checkpoint written
+    for anything else is ignored and overwritten.
+    """
+    
+    def __init__(self, document_id: int, file_path: Path, storage_path: str):
+        self.path = checkpoint_path(document_id)
+        stat = Path(file_path).stat()
+        self.key = {
+            "storage_path": storage_path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "chunk_size": settings.CHUNK_SIZE,
+            "pages_per_segment": settings.PIPELINE_PAGES_PER_SEGMENT
+        }
+        self._started = False
+    
+    def load(self) -> Tuple[List[Dict], bool]:
+        """
+        Segments saved by earlier attempts, and whether parsing finished.
+        A line cut short by a crash ends the checkpoint.
+        """
+        segments = []
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                if json.loads(f.readline() or "null") != self.key:
+                    return [], False
+                for line in f:
+                    record = json.loads(line)
+                    if record == _PARSED:
+                        self._started = True
+                        return segments, True
+                    segments.append(record)
+        except FileNotFoundError:
+            return [], False
+        except (OSError, ValueError) as e:
+            if not segments:
+                logger.warning(f"Ignoring unreadable checkpoint {self.path}: {e}")
+                return [], False
+        if segments:
+            # Drop a trailing partial line before appending after it
+            self._rewrite(segments)
+        return segments, False
+    
+    def _rewrite(self, segments: List[Dict]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self.key) + "\n")
+            for segment in segments:
+                f.write(json.dumps(segment) + "\n")
+        self._started = True
+    
+    def _append(self, record: Dict):
+        if not self._started:
+            self._rewrite([])
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    
+    def save_segment(self, segment: Dict):
+        """Record one parsed segment (best effort: a failed write only costs a re-parse)"""
+        try:
+            self._append({key: segment[key] for key in ("chunks", "head", "text_length")})
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not write checkpoint {self.path}: {e}")
+    
+    def mark_parsed(self):
+        """Record that every segment has been saved"""
+        try:
+            self._append(_PARSED)
+        except OSError as e:
+            logger.warning(f"Could not write checkpoint {self.path}: {e}")
+
+def checkpoint_path(document_id: int) -> Path:
+    """Checkpoint file of a document"""
+    return Path(settings.STORAGE_PATH) / "checkpoints" / f"document_{document_id}.jsonl"
+
+def discard_checkpoint(document_id: int):
+    """Delete a document's checkpoint, if any"""
+    try:
+        checkpoint_path(document_id).unlink(missing_ok=True)
+    except OSError as e:
+        logger.warning(f"Could not delete checkpoint of document {document_id}: {e}")
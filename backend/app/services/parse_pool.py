@@ -0,0 +1,182 @@
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Text returned with each segment (for the document summary)
+SEGMENT_HEAD_CHARS = 1000
+
+def _init_child(max_mb: int):
+    """Pool initializer: cap the child's address space"""
+    # Per-thread BLAS buffers of numpy/pandas would count against the cap
+    for variable in ("OPENBLAS_NUM_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(variable, "1")
+    if max_mb <= 0:
+        return
+    try:
+        import resource
+        limit = max_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:
+        logger.warning(f"Could not limit parser memory to {max_mb}MB: {e}")
+
+def plan_segments(file_path: str, mime_type: str, pages_per_segment: int) -> List[Optional[Tuple[int, int]]]:
+    """
+    Split a document into independently parsed segments (runs in a pool
+    process): page ranges for PDFs, the whole file (None) otherwise.
+    """
+    from app.utils.parsers import DocumentParser
+    
+    if not DocumentParser.is_pdf(file_path, mime_type):
+        return [None]
+    page_count = DocumentParser.count_pdf_pages(file_path)
+    if page_count == 0:
+        return [None]
+    return [
+        (start, min(start + pages_per_segment, page_count))
+        for start in range(0, page_count, pages_per_segment)
+    ]
+
+def parse_and_chunk(file_path: str, mime_type: str, document_id: int, chunk_size: int, pages: Optional[Tuple[int, int]] = None) -> Dict:
+    """
+    Parse one segment of a file and chunk its text (runs in a pool process).
+    Chunk indexes start at 0 in every segment.
+    Returns: dict with chunks, head (first text), text_length and error
+    (plus retryable on failure)
+    """
+    from app.utils.parsers import DocumentParser
+    from app.utils.chunking import chunk_document_text
+    
+    parse_result = DocumentParser.parse_document(file_path, mime_type, pages)
+    if parse_result.get("error"):
+        return {"chunks": [], "head": "", "text_length": 0, "error": parse_result["error"], "retryable": False}
+    
+    text = parse_result["text"]
+    return {
+        "chunks": chunk_document_text(text, document_id, chunk_size=chunk_size) if text.strip() else [],
+        "head": text[:SEGMENT_HEAD_CHARS],
+        "text_length": len(text),
+        "error": None
+    }
+
+class ParsePool:
+    """
+    Runs CPU-bound parsing and chunking in separate processes, so they use
+    other cores instead of holding the caller's GIL. Pool processes are
+    replaced after `max_tasks_per_child` documents (parser libraries leak)
+    and their address space is capped at `memory_limit_mb`.
+    """
+    
+    def __init__(self, max_workers: int = 2, max_tasks_per_child: int = 20, memory_limit_mb: int = 2048):
+        self.max_workers = max_workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.memory_limit_mb = memory_limit_mb
+        self.crashes = 0
+        self._lock = threading.Lock()
+        self._executor = self._create_executor()
+    
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            # Spawned children do not inherit sessions, sockets or threads
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_child,
+            initargs=(self.memory_limit_mb,),
+            max_tasks_per_child=self.max_tasks_per_child or None
+        )
+    
+    def _replace_broken(self, broken: ProcessPoolExecutor):
+        """Start a new pool after a child died (once per broken pool)"""
+        with self._lock:
+            if self._executor is broken:
+                self.crashes += 1
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._create_executor()
+    
+    def iter_segments(self, file_path: str, mime_type: str, document_id: int, chunk_size: int, pages_per_segment: int, start_segment: int = 0) -> Iterator[Dict]:
+        """
+        Parse and chunk a document segment by segment, yielding results in
+        order, beginning with segment `start_segment`. At most
+        max_workers + 1 segments are parsed ahead of the consumer, so a slow
+        consumer holds parsing back. Stops after a segment that failed.
+        """
+        file_path = str(file_path)
+        with self._lock:
+            executor = self._executor
+        pending = deque()
+        try:
+            plan = executor.submit(plan_segments, file_path, mime_type, pages_per_segment).result()
+            segments = iter(plan[start_segment:])
+            
+            def submit_next() -> bool:
+                for pages in segments:
+                    pending.append(executor.submit(parse_and_chunk, file_path, mime_type, document_id, chunk_size, pages))
+                    return True
+                return False
+            
+            for _ in range(self.max_workers + 1):
+                if not submit_next():
+                    break
+            while pending:
+                result = pending.popleft().result()
+                submit_next()
+                yield result
+                if result["error"]:
+                    return
+        except BrokenProcessPool:
+            # Killed mid-task: segfault in a parser library, or the OOM killer
+            logger.error(f"Parser process died on document {document_id}")
+            self._replace_broken(executor)
+            yield {"chunks": [], "head": "", "text_length": 0, "error": "Parser process crashed", "retryable": False}
+        except MemoryError:
+            # Hit the memory_limit_mb cap; the same file would hit it again
+            logger.error(f"Parser ran out of memory on document {document_id}")
+            yield {"chunks": [], "head": "", "text_length": 0, "error": "Parser ran out of memory", "retryable": False}
+        finally:
+            for future in pending:
+                future.cancel()
+    
+    def shutdown(self):
+        """Stop the pool processes"""
+        with self._lock:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+    
+    def stats(self) -> Dict:
+        """Get pool statistics"""
+        return {
+            "workers": self.max_workers,
+            "max_tasks_per_child": self.max_tasks_per_child,
+            "memory_limit_mb": self.memory_limit_mb,
+            "crashes": self.crashes
+        }
+
+# Singleton instance (one pool per process)
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+def get_parse_pool() -> ParsePool:
+    """Get parse pool instance"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ParsePool(
+                max_workers=settings.PARSE_POOL_WORKERS,
+                max_tasks_per_child=settings.PARSE_POOL_MAX_TASKS_PER_CHILD,
+                memory_limit_mb=settings.PARSE_POOL_MEMORY_LIMIT_MB
+            )
+        return _parse_pool
+
+def shutdown_parse_pool():
+    """Stop the parse pool if it was started"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown()
+            _parse_pool = None
@@ -0,0 +1,93 @@
+from typing import Dict, List, Optional
+import numpy as np
+
+def collapse_by_document(candidates: List[Dict], scoring: str = "max") -> List[Dict]:
+    """
+    One candidate per document: its best chunk, scored by the document's
+    best chunk ("max") or the sum of its chunks' scores ("sum").
+    Candidates without a document_id are kept as they are. Best first.
+    """
+    if scoring not in ("max", "sum"):
+        raise ValueError(f"Unknown collapse scoring: {scoring}")
+    
+    groups = {}
+    loose = []
+    for candidate in candidates:
+        doc_id = candidate.get("document_id")
+        if doc_id is None:
+            loose.append(candidate)
+            continue
+        group = groups.get(doc_id)
+        if group is None:
+            groups[doc_id] = {"best": candidate, "total": candidate["score"], "chunks": 1}
+            continue
+        group["total"] += candidate["score"]
+        group["chunks"] += 1
+        if candidate["score"] > group["best"]["score"]:
+            group["best"] = candidate
+    
+    collapsed = []
+    for group in groups.values():
+        best = group["best"]
+        score = group["total"] if scoring == "sum" else best["score"]
+        collapsed.append({**best, "score": score, "matched_chunks": group["chunks"]})
+    collapsed.extend(loose)
+    collapsed.sort(key=lambda c: c["score"], reverse=True)
+    return collapsed
+
+def mmr_select(candidates: List[Dict], k: int, lambda_: float = 0.7) -> List[Dict]:
+    """
+    Maximal marginal relevance: repeatedly pick the candidate maximizing
+    lambda * relevance - (1 - lambda) * max similarity to those already picked.
+    Relevance is the candidate score; similarity is the cosine of the
+    candidates' "embedding" vectors (missing embeddings count as dissimilar).
+    Vectorized: one similarity matrix, then O(k * n) updates.
+    """
+    if k <= 0 or not candidates:
+        return []
+    if len(candidates) <= 1:
+        return list(candidates)
+    
+    dimension = next((len(c["embedding"]) for c in candidates if c.get("embedding") is not None), 0)
+    if not dimension:
+        return sorted(candidates, key=lambda c: c["score"], reverse=True)[:k]
+    
+    vectors = np.zeros((len(candidates), dimension), dtype=np.float32)
+    for i, candidate in enumerate(candidates):
+        embedding = candidate.get("embedding")
+        if embedding is not None and len(embedding) == dimension:
+            vectors[i] = embedding
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.where(norms == 0, 1.0, norms)
+    similarity = vectors @ vectors.T
+    
+    relevance = np.array([c["score"] for c in candidates], dtype=np.float32)
+    # Keep relevance on the same 0-1 scale as similarity (sum-collapsed scores exceed 1)
+    if relevance.max() > 0:
+        relevance /= relevance.max()
+    max_similarity = np.zeros(len(candidates), dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    
+    selected = []
+    for _ in range(min(k, len(candidates))):
+        marginal = lambda_ * relevance - (1 - lambda_) * max_similarity
+        marginal[~available] = -np.inf
+        best = int(np.argmax(marginal))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    
+    return [candidates[i] for i in selected]
+
+def rerank(
+    candidates: List[Dict],
+    top_k: int,
+    collapse: Optional[str] = None,
+    mmr_lambda: Optional[float] = None
+) -> List[Dict]:
+    """Optionally collapse by document, then pick top_k by MMR or by score"""
+    if collapse:
+        candidates = collapse_by_document(candidates, collapse)
+    if mmr_lambda is not None:
+        return mmr_select(candidates, top_k, mmr_lambda)
+    return sorted(candidates, key=lambda c: c["score"], reverse=True)[:top_k]
@@ -1,186 +1,635 @@
+import asyncio
+import base64
+import heapq
+import json
 import logging
+import secrets
 import time
-import re
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, List, Dict, Optional
 from datetime import datetime
 from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.document_cache import get_document_cache
 from app.services.embeddings import get_embedding_service
-from app.services.vector_db import get_vector_db
-from app.models.models import Document, DocumentChunk, SearchHistory
+from app.services.index_generation import get_index_generation
+from app.services.lexical_search import get_lexical_search
+from app.services.log_writer import get_log_writer
+from app.services.reranking import rerank
+from app.services.semantic_cache import SemanticQueryCache
+from app.services.vector_db import get_vector_db, build_where
+from app.utils.cache import LRUCache
+from app.utils.metrics import StageTimer, registry
+from app.utils.snippets import build_snippet
+from app.utils.storage import get_file_type
+from app.models.models import DocumentChunk
 
 logger = logging.getLogger(__name__)
 
+stage_histogram = registry.histogram(
+    "search_stage_duration_ms", "Time spent in each search stage", label="stage"
+)
+search_histogram = registry.histogram(
+    "search_duration_ms", "End-to-end search latency by mode served", label="mode"
+)
+
 class SearchService:
-    """Semantic search service with filters and smart snippets"""
+    """Semantic, lexical and hybrid search with filters and smart snippets"""
     
     def __init__(self):
         self.embedding_service = get_embedding_service()
         self.vector_db = get_vector_db()
+        self.document_cache = get_document_cache()
+        self.lexical_search = get_lexical_search()
+        self.result_cache = LRUCache(
+            max_size=settings.SEARCH_CACHE_SIZE,
+            ttl_seconds=settings.SEARCH_CACHE_TTL_SECONDS
+        )
+        self.cursor_cache = LRUCache(
+            max_size=settings.SEARCH_CURSOR_CACHE_SIZE,
+            ttl_seconds=settings.SEARCH_CURSOR_TTL_SECONDS
+        )
+        self.semantic_cache = SemanticQueryCache(
+            threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+            entries_per_variant=settings.SEMANTIC_CACHE_ENTRIES,
+            ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+            variants_per_company=settings.SEMANTIC_CACHE_VARIANTS,
+            max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES
+        ) if settings.SEMANTIC_CACHE_ENABLED else None
+        # Blocking Chroma and SQLAlchemy calls run on dedicated pools so they
+        # never occupy the event loop or the framework's shared threadpool
+        self.vector_executor = ThreadPoolExecutor(
+            max_workers=settings.SEARCH_VECTOR_WORKERS,
+            thread_name_prefix="search-vector"
+        )
+        self.db_executor = ThreadPoolExecutor(
+            max_workers=settings.SEARCH_DB_WORKERS,
+            thread_name_prefix="search-db"
+        )
+        # Cross-tenant fan-out gets its own small pool, so one admin search
+        # over many companies cannot starve regular searches
+        self.fan_out_executor = ThreadPoolExecutor(
+            max_workers=settings.ADMIN_SEARCH_WORKERS,
+            thread_name_prefix="search-fan-out"
+        )
+    
+    async def _run_vector(self, func: Callable, *args, **kwargs):
+        """Run a blocking vector DB call on the vector executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.vector_executor, partial(func, *args, **kwargs))
+    
+    async def _run_fan_out(self, func: Callable, *args, **kwargs):
+        """Run a blocking vector DB call of a cross-tenant search on the fan-out executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.fan_out_executor, partial(func, *args, **kwargs))
+    
+    async def _run_db(self, func: Callable, *args, **kwargs):
+        """Run func(db, ...) on the DB executor with a session of its own"""
+        def run():
+            db = SessionLocal()
+            try:
+                return func(db, *args, **kwargs)
+            finally:
+                db.close()
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.db_executor, run)
     
     def extract_snippet(self, text: str, query: str, max_length: int = 200) -> str:
         """Extract the most relevant snippet from text based on query"""
-        if len(text) <= max_length:
-            return text
-        
-        # Find query words in text
-        query_words = [w.lower() for w in query.split() if len(w) > 2]
-        text_lower = text.lower()
-        
-        # Find best starting position (where most query words appear nearby)
-        best_pos = 0
-        best_score = 0
-        
-        for i in range(0, len(text) - max_length, 50):
-            window = text_lower[i:i + max_length]
-            score = sum(1 for word in query_words if word in window)
-            if score > best_score:
-                best_score = score
-                best_pos = i
-        
-        # Extract snippet
-        snippet = text[best_pos:best_pos + max_length]
-        
-        # Clean up snippet boundaries
-        if best_pos > 0:
-            snippet = "..." + snippet.lstrip()
-        if best_pos + max_length < len(text):
-            # Try to end at a sentence or word boundary
-            last_period = snippet.rfind('.')
-            last_space = snippet.rfind(' ')
-            if last_period > max_length * 0.7:
-                snippet = snippet[:last_period + 1]
-            elif last_space > max_length * 0.8:
-                snippet = snippet[:last_space] + "..."
-            else:
-                snippet = snippet + "..."
-        
-        return snippet
+        return build_snippet(text, query, max_length)[0]
     
     def get_file_type(self, filename: str) -> str:
         """Extract file type from filename"""
-        if '.' in filename:
-            return filename.rsplit('.', 1)[1].lower()
-        return 'unknown'
+        return get_file_type(filename)
+    
+    def _vector_candidates(
+        self,
+        query_embedding: List[float],
+        company_id: int,
+        n_results: int,
+        file_type: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None
+    ) -> List[Dict]:
+        """Nearest chunks from the company's vector collection, best first"""
+        # Filters run inside the vector query so selective filters still fill top_k
+        vector_results = self.vector_db.search(
+            query_embedding=query_embedding,
+            company_id=company_id,
+            n_results=n_results,
+            where=build_where(file_type, date_from, date_to)
+        )
+        
+        candidates = []
+        if vector_results and vector_results.get('ids') and vector_results['ids'][0]:
+            ids = vector_results['ids'][0]
+            documents = vector_results.get('documents', [[]])[0]
+            metadatas = vector_results.get('metadatas', [[]])[0]
+            distances = vector_results.get('distances', [[]])[0]
+            
+            for i, chunk_id in enumerate(ids):
+                metadata = (metadatas[i] if i < len(metadatas) else None) or {}
+                distance = distances[i] if i < len(distances) else 1.0
+                candidates.append({
+                    "chunk_id": chunk_id,
+                    "document_id": metadata.get('document_id'),
+                    "chunk_index": metadata.get('chunk_index', 0),
+                    "filename": metadata.get('filename', 'Unknown'),
+                    "chunk_text": documents[i] if i < len(documents) else "",
+                    "score": max(0, 1 - distance)
+                })
+        return candidates
+    
+    async def _lexical_candidates(
+        self,
+        query: str,
+        company_id: int,
+        n_results: int,
+        timer: StageTimer,
+        file_type: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None
+    ) -> List[Dict]:
+        """Full-text candidates from Postgres"""
+        try:
+            with timer.stage("lexical_query"):
+                candidates = await self._run_db(
+                    self.lexical_search.search, query, company_id,
+                    n_results=n_results,
+                    file_type=file_type,
+                    date_from=date_from,
+                    date_to=date_to
+                )
+        except Exception as e:
+            logger.error(f"Lexical search error: {e}")
+            candidates = []
+        timer.count("lexical_candidates", len(candidates))
+        return candidates
+    
+    async def _semantic_candidates(
+        self,
+        query: str,
+        company_id: int,
+        n_results: int,
+        timer: StageTimer,
+        generation: int,
+        **filters
+    ) -> Optional[List[Dict]]:
+        """Embed the query and search vectors; None when no embedding could be generated"""
+        logger.info(f"Generating embedding for query: {query[:50]}...")
+        with timer.stage("embedding"):
+            query_embedding = await self.embedding_service.generate_query_embedding_async(query)
+        if query_embedding is None:
+            return None
+        
+        # Paraphrases of a recent query reuse its candidates instead of hitting Chroma
+        variant = (n_results, tuple(sorted((k, v) for k, v in filters.items() if v is not None)))
+        if self.semantic_cache:
+            candidates = self.semantic_cache.get(company_id, generation, variant, query_embedding)
+            timer.count("semantic_cache_hit", int(candidates is not None))
+            if candidates is not None:
+                timer.count("vector_candidates", len(candidates))
+                return candidates
+        
+        logger.info(f"Searching vector DB for company {company_id}")
+        with timer.stage("vector_query"):
+            candidates = await self._run_vector(self._vector_candidates, query_embedding, company_id, n_results, **filters)
+        timer.count("vector_candidates", len(candidates))
+        if self.semantic_cache and candidates:
+            self.semantic_cache.set(company_id, generation, variant, query_embedding, candidates)
+        return candidates
+    
+    @staticmethod
+    def reciprocal_rank_fusion(ranked_lists: List[List[Dict]], k: int = 60) -> List[Dict]:
+        """
+        Fuse ranked candidate lists with RRF: score = sum(1 / (k + rank)).
+        Scores are scaled so a chunk ranked first in every list scores 1.0.
+        """
+        fused = {}
+        for candidates in ranked_lists:
+            for rank, candidate in enumerate(candidates, 1):
+                entry = fused.get(candidate["chunk_id"])
+                if entry is None:
+                    entry = fused[candidate["chunk_id"]] = {**candidate, "score": 0.0}
+                entry["score"] += 1.0 / (k + rank)
+        
+        best_possible = len(ranked_lists) / (k + 1)
+        results = sorted(fused.values(), key=lambda c: c["score"], reverse=True)
+        for candidate in results:
+            candidate["score"] = candidate["score"] / best_possible
+        return results
+    
+    async def _retrieve(
+        self,
+        query: str,
+        company_id: int,
+        mode: str,
+        n_results: int,
+        timer: StageTimer,
+        generation: int,
+        **filters
+    ):
+        """
+        Run retrieval for the requested mode.
+        Returns (candidates, mode actually served) or (None, mode) if nothing could run.
+        """
+        if mode == "lexical":
+            return await self._lexical_candidates(query, company_id, n_results, timer, **filters), "lexical"
+        
+        if mode == "hybrid":
+            # Lexical and semantic retrieval run concurrently; a slow or failed
+            # embedding falls back to the lexical results alone
+            async def semantic_within_deadline():
+                try:
+                    return await asyncio.wait_for(
+                        self._semantic_candidates(query, company_id, n_results, timer, generation, **filters),
+                        timeout=settings.HYBRID_EMBEDDING_TIMEOUT_MS / 1000
+                    )
+                except asyncio.TimeoutError:
+                    logger.warning("Embedding too slow, serving lexical results only")
+                    return None
+            
+            lexical, semantic = await asyncio.gather(
+                self._lexical_candidates(query, company_id, n_results, timer, **filters),
+                semantic_within_deadline()
+            )
+            if semantic is None:
+                return lexical, "lexical_fallback"
+            with timer.stage("fusion"):
+                fused = self.reciprocal_rank_fusion([semantic, lexical], k=settings.RRF_K)
+            return fused, "hybrid"
+        
+        semantic = await self._semantic_candidates(query, company_id, n_results, timer, generation, **filters)
+        if semantic is None:
+            # Embedding provider unavailable: degrade to full-text search
+            logger.warning("Query embedding failed, falling back to lexical search")
+            lexical = await self._lexical_candidates(query, company_id, n_results, timer, **filters)
+            if lexical:
+                return lexical, "lexical_fallback"
+            return None, mode
+        return semantic, "semantic"
+    
+    async def _attach_embeddings(self, candidates: List[Dict], company_id: int, timer: StageTimer):
+        """Load the stored vectors of candidates (needed by MMR) in one vector DB call"""
+        missing = [c["chunk_id"] for c in candidates if c.get("embedding") is None]
+        with timer.stage("embedding_fetch"):
+            embeddings = await self._run_vector(self.vector_db.get_embeddings, company_id, missing)
+        for candidate in candidates:
+            if candidate.get("embedding") is None:
+                candidate["embedding"] = embeddings.get(candidate["chunk_id"])
+    
+    def _rank_candidates(
+        self,
+        db: Session,
+        candidates: List[Dict],
+        company_id: int,
+        timer: StageTimer,
+        collapse: Optional[str] = None,
+        mmr_lambda: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Drop stale and duplicate chunks, then re-rank (optional collapse by
+        document and MMR diversity). Best first; all survivors unless limited.
+        """
+        # Resolve every hit's document in one query (cached per company)
+        with timer.stage("document_lookup"):
+            doc_meta = self.document_cache.get_many(db, company_id, [c["document_id"] for c in candidates])
+        
+        live = []
+        seen = set()
+        for candidate in candidates:
+            doc_id = candidate["document_id"]
+            if doc_id and doc_id not in doc_meta:
+                continue
+            
+            # Deduplicate
+            key = f"{doc_id}-{candidate['chunk_index']}"
+            if key in seen:
+                continue
+            seen.add(key)
+            live.append(candidate)
+        
+        with timer.stage("rerank"):
+            return rerank(live, limit or len(live), collapse=collapse, mmr_lambda=mmr_lambda)
+    
+    @staticmethod
+    def _chunk_texts(db: Session, chunk_ids: List[str]) -> Dict[str, str]:
+        """Text of chunks by vector chunk id (chunks deleted since are omitted)"""
+        if not chunk_ids:
+            return {}
+        return dict(
+            db.query(DocumentChunk.chunk_id_for_vector, DocumentChunk.chunk_text)
+            .filter(DocumentChunk.chunk_id_for_vector.in_(chunk_ids))
+            .all()
+        )
     
-    def search(
+    def _page_results(self, db: Session, ranked: List[Dict], query: str, company_id: int, timer: StageTimer) -> List[Dict]:
+        """
+        Attach document metadata and snippets to ranked candidates (documents
+        deleted since are dropped). Text of candidates kept without it (cursor
+        lists) is loaded for this page only.
+        """
+        with timer.stage("document_lookup"):
+            doc_meta = self.document_cache.get_many(db, company_id, [c["document_id"] for c in ranked])
+        texts = {}
+        missing = [c["chunk_id"] for c in ranked if "chunk_text" not in c]
+        if missing:
+            with timer.stage("chunk_text"):
+                texts = self._chunk_texts(db, missing)
+        
+        snippet_start = time.perf_counter()
+        results = []
+        for candidate in ranked:
+            doc_id = candidate["document_id"]
+            if doc_id:
+                doc = doc_meta.get(doc_id)
+                if not doc:
+                    continue
+                filename = doc["filename"]
+                created_at = doc["created_at"]
+                doc_file_type = doc["file_type"]
+            else:
+                filename = candidate.get("filename", "Unknown")
+                created_at = None
+                doc_file_type = self.get_file_type(filename)
+            
+            chunk_text = candidate["chunk_text"] if "chunk_text" in candidate else texts.get(candidate["chunk_id"])
+            if chunk_text is None:
+                continue
+            snippet, highlights = build_snippet(chunk_text, query)
+            results.append({
+                "document_id": doc_id,
+                "filename": filename,
+                "chunk_text": chunk_text,
+                "snippet": snippet,
+                "highlights": highlights,
+                "chunk_index": candidate["chunk_index"],
+                "score": round(candidate["score"], 4),
+                "file_type": doc_file_type,
+                "created_at": created_at,
+                "matched_chunks": candidate.get("matched_chunks")
+            })
+        timer.add("snippets", (time.perf_counter() - snippet_start) * 1000)
+        return results
+    
+    def _build_results(
+        self,
+        db: Session,
+        candidates: List[Dict],
+        query: str,
+        company_id: int,
+        top_k: int,
+        timer: StageTimer,
+        collapse: Optional[str] = None,
+        mmr_lambda: Optional[float] = None
+    ) -> List[Dict]:
+        """Rank candidates and build the top_k results"""
+        ranked = self._rank_candidates(db, candidates, company_id, timer, collapse, mmr_lambda, limit=top_k)
+        return self._page_results(db, ranked, query, company_id, timer)
+    
+    @staticmethod
+    def encode_cursor(token: str, offset: int) -> str:
+        """Opaque cursor pointing into a cached ranked candidate list"""
+        payload = json.dumps({"t": token, "o": offset}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Optional[tuple]:
+        """(token, offset) of a cursor, or None if it is malformed"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            token, offset = payload["t"], int(payload["o"])
+        except (ValueError, KeyError, TypeError):
+            return None
+        if not isinstance(token, str) or offset < 0:
+            return None
+        return token, offset
+    
+    @staticmethod
+    def _slim(candidate: Dict) -> Dict:
+        """Candidate as kept in a cursor list: ids and scores, no text or vector"""
+        return {k: v for k, v in candidate.items() if k not in ("chunk_text", "embedding")}
+    
+    def _store_candidates(self, company_id: int, query: str, served_mode: str, filters_applied: Dict, ranked: List[Dict], retrieval: Dict) -> str:
+        """
+        Keep a ranked candidate list for later pages; returns its token.
+        `retrieval` holds what is needed to deepen the list later (see _deepen).
+        """
+        token = secrets.token_urlsafe(16)
+        self.cursor_cache.set(token, {
+            "company_id": company_id,
+            "query": query,
+            "served_mode": served_mode,
+            "filters_applied": filters_applied,
+            "candidates": [self._slim(c) for c in ranked],
+            **retrieval
+        })
+        return token
+    
+    async def _deepen(self, entry: Dict, served: int, company_id: int, timer: StageTimer):
+        """
+        Re-run retrieval with the full SEARCH_CANDIDATE_POOL for a cursor list
+        that ran out. Results already served keep their place; the rest of
+        the deeper ranking follows them.
+        """
+        entry["exhausted"] = True
+        candidates, _ = await self._retrieve(
+            entry["query"], company_id, entry["mode"], settings.SEARCH_CANDIDATE_POOL,
+            timer, entry["generation"], **entry["filters"]
+        )
+        if not candidates:
+            return
+        if entry["mmr_lambda"] is not None:
+            await self._attach_embeddings(candidates, company_id, timer)
+        ranked = await self._run_db(
+            self._rank_candidates, candidates, company_id, timer,
+            collapse=entry["collapse"], mmr_lambda=entry["mmr_lambda"]
+        )
+        # Collapsed results stand for documents, whichever chunk represents them
+        key = (lambda c: c["document_id"]) if entry["collapse"] else (lambda c: c["chunk_id"])
+        shown = entry["candidates"][:served]
+        seen = {key(c) for c in shown}
+        entry["candidates"] = shown + [self._slim(c) for c in ranked if key(c) not in seen]
+    
+    async def _search_page(self, cursor: str, company_id: int, top_k: int, timer: StageTimer) -> Dict:
+        """Serve a later page from a cached candidate list (no embedding or vector work)"""
+        decoded = self.decode_cursor(cursor)
+        entry = self.cursor_cache.get(decoded[0]) if decoded else None
+        # Tokens are unguessable, but never serve another company's list
+        if entry is None or entry["company_id"] != company_id:
+            return {
+                "success": False,
+                "error": "Search cursor is invalid or expired",
+                "status_code": 410,
+                "results": [],
+                "search_time_ms": 0,
+                "filters_applied": {}
+            }
+        
+        token, offset = decoded
+        if offset + top_k > len(entry["candidates"]) and not entry["exhausted"]:
+            with timer.stage("deepen"):
+                await self._deepen(entry, offset, company_id, timer)
+        ranked = entry["candidates"]
+        page = ranked[offset:offset + top_k]
+        results = await self._run_db(self._page_results, page, entry["query"], company_id, timer)
+        next_offset = offset + top_k
+        return {
+            "success": True,
+            "query": entry["query"],
+            "results": results,
+            "total_results": len(results),
+            "filters_applied": entry["filters_applied"],
+            "mode": entry["served_mode"],
+            # A list that can still be deepened has more pages
+            "next_cursor": self.encode_cursor(token, next_offset) if next_offset < len(ranked) or not entry["exhausted"] else None
+        }
+    
+    def _result_cache_key(
+        self,
+        query: str,
+        company_id: int,
+        generation: int,
+        top_k: int,
+        mode: str,
+        filters_applied: Dict,
+        collapse: Optional[str] = None,
+        mmr_lambda: Optional[float] = None
+    ) -> tuple:
+        """Key identifying a search against the company's current corpus"""
+        return (
+            company_id,
+            generation,
+            self.embedding_service.normalize_query(query),
+            mode,
+            top_k,
+            (filters_applied.get('file_type') or '').lower(),
+            filters_applied.get('date_from'),
+            filters_applied.get('date_to'),
+            collapse,
+            mmr_lambda
+        )
+    
+    async def search(
         self, 
         query: str, 
         company_id: int, 
         user_id: int,
-        db: Session,
         top_k: int = 5,
         file_type: Optional[str] = None,
         date_from: Optional[datetime] = None,
-        date_to: Optional[datetime] = None
+        date_to: Optional[datetime] = None,
+        mode: str = "semantic",
+        explain: bool = False,
+        collapse: Optional[str] = None,
+        mmr_lambda: Optional[float] = None,
+        cursor: Optional[str] = None
     ) -> Dict:
         """
-        Perform semantic search with filters
+        Perform search with filters. Fully async: the embedding call is
+        awaited and blocking vector/DB work runs on dedicated executors.
+        mode: 'semantic' (vectors), 'lexical' (Postgres full-text) or 'hybrid' (both, fused with RRF)
+        explain: include per-stage timings and candidate counts in the response
+        collapse: 'max' or 'sum' to return one result per document
+        mmr_lambda: relevance weight (0-1) for MMR diversity re-ranking; None keeps score order
+        cursor: next_cursor of a previous response; serves the following top_k
+        results of that search from its cached candidate list
         """
         start_time = time.time()
+        timer = StageTimer()
+        
+        if cursor:
+            try:
+                response = await self._search_page(cursor, company_id, top_k, timer)
+            except Exception as e:
+                logger.error(f"Search page error: {e}")
+                response = {"success": False, "error": str(e), "results": [], "filters_applied": {}}
+            response["search_time_ms"] = round((time.time() - start_time) * 1000, 2)
+            if response["success"]:
+                search_histogram.observe("page", timer.elapsed_ms())
+                if explain:
+                    response["explain"] = {"cache_hit": True, **timer.to_dict()}
+            return response
+        
         filters_applied = {}
+        filters = {"file_type": file_type, "date_from": date_from, "date_to": date_to}
+        
+        # Track filters applied
+        if file_type:
+            filters_applied['file_type'] = file_type
+        if date_from:
+            filters_applied['date_from'] = date_from.isoformat()
+        if date_to:
+            filters_applied['date_to'] = date_to.isoformat()
         
         try:
-            # 1. Generate query embedding
-            logger.info(f"Generating embedding for query: {query[:50]}...")
-            query_embedding = self.embedding_service.generate_query_embedding(query)
-            
-            if query_embedding is None:
-                return {
-                    "success": False,
-                    "error": "Failed to generate query embedding",
-                    "results": [],
-                    "search_time_ms": 0,
-                    "filters_applied": {}
-                }
-            
-            # 2. Search vector database with company filter
-            logger.info(f"Searching vector DB for company {company_id}")
-            
-            # Get more results than needed to allow for filtering
-            vector_results = self.vector_db.search(
-                query_embedding=query_embedding,
-                n_results=top_k * 3,  # Get extra for filtering
-                where={"company_id": company_id}
-            )
-            
-            # 3. Process results
-            results = []
+            # 1. Serve identical searches from the result cache. The key includes
+            # the company's index generation, so corpus changes invalidate it
+            with timer.stage("cache_lookup"):
+                generation = await self._run_db(get_index_generation, company_id)
+                cache_key = self._result_cache_key(
+                    query, company_id, generation, top_k, mode, filters_applied, collapse, mmr_lambda
+                )
+                cached = self.result_cache.get(cache_key)
+                # A cached first page is only usable while its cursor list is
+                if cached is not None and cached[2] and self.cursor_cache.get(cached[2]) is None:
+                    cached = None
             
-            if vector_results and vector_results.get('ids') and vector_results['ids'][0]:
-                ids = vector_results['ids'][0]
-                documents = vector_results.get('documents', [[]])[0]
-                metadatas = vector_results.get('metadatas', [[]])[0]
-                distances = vector_results.get('distances', [[]])[0]
+            if cached is not None:
+                results, served_mode, token = cached
+            else:
+                # 2. Retrieve candidates: 3x top_k to absorb duplicate and stale
+                # chunks. Later pages deepen the pool only when requested
+                n_candidates = top_k * 3
+                candidates, served_mode = await self._retrieve(query, company_id, mode, n_candidates, timer, generation, **filters)
                 
-                for i, chunk_id in enumerate(ids):
-                    metadata = metadatas[i] if i < len(metadatas) else {}
-                    doc_id = metadata.get('document_id')
-                    
-                    if doc_id:
-                        doc = db.query(Document).filter(Document.id == doc_id).first()
-                        if not doc:
-                            continue
-                        filename = doc.filename
-                        created_at = doc.created_at
-                        doc_file_type = self.get_file_type(filename)
-                        
-                        # Apply file type filter
-                        if file_type and doc_file_type != file_type.lower():
-                            continue
-                        
-                        # Apply date filters
-                        if date_from and created_at < date_from:
-                            continue
-                        if date_to and created_at > date_to:
-                            continue
-                    else:
-                        filename = metadata.get('filename', 'Unknown')
-                        created_at = None
-                        doc_file_type = self.get_file_type(filename)
-                    
-                    distance = distances[i] if i < len(distances) else 1.0
-                    score = max(0, 1 - distance)
-                    
-                    chunk_text = documents[i] if i < len(documents) else ""
-                    snippet = self.extract_snippet(chunk_text, query)
-                    
-                    results.append({
-                        "document_id": doc_id,
-                        "filename": filename,
-                        "chunk_text": chunk_text,
-                        "snippet": snippet,
-                        "chunk_index": metadata.get('chunk_index', 0),
-                        "score": round(score, 4),
-                        "file_type": doc_file_type,
-                        "created_at": created_at
+                if candidates is None:
+                    return {
+                        "success": False,
+                        "error": "Failed to generate query embedding",
+                        "results": [],
+                        "search_time_ms": 0,
+                        "filters_applied": {}
+                    }
+                
+                # 3. Process results
+                timer.count("candidates", len(candidates))
+                if mmr_lambda is not None:
+                    await self._attach_embeddings(candidates, company_id, timer)
+                ranked = await self._run_db(
+                    self._rank_candidates, candidates, company_id, timer,
+                    collapse=collapse, mmr_lambda=mmr_lambda
+                )
+                results = await self._run_db(self._page_results, ranked[:top_k], query, company_id, timer)
+                
+                # Keep the rest of the ranking for cursor pagination
+                token = None
+                if len(ranked) > top_k:
+                    token = self._store_candidates(company_id, query, served_mode, filters_applied, ranked, {
+                        "mode": mode,
+                        "filters": filters,
+                        "generation": generation,
+                        "collapse": collapse,
+                        "mmr_lambda": mmr_lambda,
+                        # Fewer candidates than asked for: there is nothing deeper
+                        "exhausted": len(candidates) < n_candidates or n_candidates >= settings.SEARCH_CANDIDATE_POOL
                     })
+                
+                # Degraded (fallback) results are not worth keeping
+                if served_mode == mode:
+                    self.result_cache.set(cache_key, (results, served_mode, token))
             
-            # Deduplicate
-            seen = set()
-            unique_results = []
-            for r in results:
-                key = f"{r['document_id']}-{r['chunk_index']}"
-                if key not in seen:
-                    seen.add(key)
-                    unique_results.append(r)
-            
-            results = unique_results
-            results.sort(key=lambda x: x['score'], reverse=True)
-            results = results[:top_k]  # Limit to requested amount
-            
+            timer.count("results", len(results))
             search_time_ms = round((time.time() - start_time) * 1000, 2)
             
-            # Track filters applied
-            if file_type:
-                filters_applied['file_type'] = file_type
-            if date_from:
-                filters_applied['date_from'] = date_from.isoformat()
-            if date_to:
-                filters_applied['date_to'] = date_to.isoformat()
-            
-            # Log search history
-            try:
-                search_record = SearchHistory(
+            # Log search history (written in batches off the request path)
+            with timer.stage("history"):
+                get_log_writer().log_search(
                     user_id=user_id,
                     company_id=company_id,
                     query_text=query,
@@ -188,24 +637,32 @@ class SearchService:
                         "total_results": len(results),
                         "top_score": results[0]['score'] if results else 0,
                         "search_time_ms": search_time_ms,
-                        "filters": filters_applied
+                        "filters": filters_applied,
+                        "mode": served_mode,
+                        "cache_hit": cached is not None,
+                        **timer.to_dict()
                     }
                 )
-                db.add(search_record)
-                db.commit()
-            except Exception as e:
-                logger.error(f"Failed to log search history: {e}")
             
-            logger.info(f"Search completed: {len(results)} results in {search_time_ms}ms")
+            for stage, elapsed_ms in timer.stages.items():
+                stage_histogram.observe(stage, elapsed_ms)
+            search_histogram.observe(served_mode, timer.elapsed_ms())
             
-            return {
+            logger.info(f"Search completed ({served_mode}): {len(results)} results in {search_time_ms}ms")
+            
+            response = {
                 "success": True,
                 "query": query,
                 "results": results,
                 "total_results": len(results),
                 "search_time_ms": search_time_ms,
-                "filters_applied": filters_applied
+                "filters_applied": filters_applied,
+                "mode": served_mode,
+                "next_cursor": self.encode_cursor(token, top_k) if token else None
             }
+            if explain:
+                response["explain"] = {"cache_hit": cached is not None, **timer.to_dict()}
+            return response
             
         except Exception as e:
             logger.error(f"Search error: {e}")
@@ -217,10 +674,151 @@ class SearchService:
                 "filters_applied": {}
             }
 
+    async def _tenant_candidates(
+        self,
+        query_embedding: List[float],
+        company_id: int,
+        n_results: int,
+        **filters
+    ) -> Dict:
+        """Vector candidates of one company plus how long they took"""
+        start = time.perf_counter()
+        candidates = await self._run_fan_out(self._vector_candidates, query_embedding, company_id, n_results, **filters)
+        for candidate in candidates:
+            candidate["company_id"] = company_id
+        return {
+            "company_id": company_id,
+            "candidates": candidates,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+    
+    def _build_tenant_results(self, db: Session, candidates: List[Dict], query: str, top_k: int, timer: StageTimer) -> List[Dict]:
+        """_build_results per company for merged cross-tenant candidates"""
+        by_company = {}
+        for candidate in candidates:
+            by_company.setdefault(candidate["company_id"], []).append(candidate)
+        
+        results = []
+        for company_id, company_candidates in by_company.items():
+            for result in self._build_results(db, company_candidates, query, company_id, top_k, timer):
+                result["company_id"] = company_id
+                results.append(result)
+        return heapq.nlargest(top_k, results, key=lambda r: r["score"])
+    
+    async def admin_search(
+        self,
+        query: str,
+        top_k: int = 5,
+        company_ids: Optional[List[int]] = None,
+        file_type: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        deadline_ms: Optional[int] = None
+    ) -> Dict:
+        """
+        Cross-tenant semantic search for system admins. The query is embedded
+        once and fanned out to every company's collection concurrently; hits
+        are merged with a heap top-k. Companies that miss the global deadline
+        (or fail) are reported and left out, so results may be partial.
+        """
+        start_time = time.time()
+        timer = StageTimer()
+        deadline = (deadline_ms or settings.ADMIN_SEARCH_DEADLINE_MS) / 1000
+        filters = {"file_type": file_type, "date_from": date_from, "date_to": date_to}
+        
+        with timer.stage("embedding"):
+            query_embedding = await self.embedding_service.generate_query_embedding_async(query)
+        if query_embedding is None:
+            return {
+                "success": False,
+                "error": "Failed to generate query embedding",
+                "results": [],
+                "search_time_ms": 0
+            }
+        
+        # Only companies that have a collection; requested ids without one are skipped
+        existing = await self._run_fan_out(self.vector_db.list_company_ids)
+        company_ids = existing if company_ids is None else sorted(set(company_ids) & set(existing))
+        
+        # Each shard gets the whole budget left after embedding
+        remaining = max(0.0, deadline - (time.time() - start_time))
+        tasks = {
+            asyncio.ensure_future(self._tenant_candidates(query_embedding, company_id, top_k * 3, **filters)): company_id
+            for company_id in company_ids
+        }
+        with timer.stage("fan_out"):
+            done, pending = await asyncio.wait(tasks, timeout=remaining) if tasks else (set(), set())
+        for task in pending:
+            task.cancel()
+        
+        tenants = []
+        merged = []
+        for task, company_id in tasks.items():
+            if task in pending:
+                tenants.append({"company_id": company_id, "status": "timeout", "latency_ms": None, "candidates": 0})
+                continue
+            error = task.exception()
+            if error is not None:
+                logger.error(f"Admin search failed for company {company_id}: {error}")
+                tenants.append({"company_id": company_id, "status": "error", "latency_ms": None, "candidates": 0})
+                continue
+            shard = task.result()
+            tenants.append({
+                "company_id": company_id,
+                "status": "ok",
+                "latency_ms": shard["latency_ms"],
+                "candidates": len(shard["candidates"])
+            })
+            merged.extend(shard["candidates"])
+        
+        # Keep the best candidates across all shards, with headroom for stale chunks
+        top_candidates = heapq.nlargest(top_k * 3, merged, key=lambda c: c["score"])
+        timer.count("candidates", len(top_candidates))
+        results = await self._run_db(self._build_tenant_results, top_candidates, query, top_k, timer)
+        
+        search_time_ms = round((time.time() - start_time) * 1000, 2)
+        partial = any(t["status"] != "ok" for t in tenants)
+        search_histogram.observe("admin", timer.elapsed_ms())
+        logger.info(
+            f"Admin search completed: {len(results)} results from {len(tenants)} companies "
+            f"in {search_time_ms}ms{' (partial)' if partial else ''}"
+        )
+        
+        return {
+            "success": True,
+            "query": query,
+            "results": results,
+            "total_results": len(results),
+            "search_time_ms": search_time_ms,
+            "partial": partial,
+            "tenants": sorted(tenants, key=lambda t: t["company_id"]),
+            **timer.to_dict()
+        }
+    
+    def get_cache_stats(self) -> Dict:
+        """Hit rates and sizes of the caches on the search path"""
+        embedding_cache = self.embedding_service.cache
+        return {
+            "result_cache": self.result_cache.stats(),
+            "cursor_cache": self.cursor_cache.stats(),
+            "query_embedding_cache": self.embedding_service.query_cache.stats(),
+            "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+            "semantic_cache": self.semantic_cache.stats() if self.semantic_cache else None,
+            "document_cache": self.document_cache.stats(),
+            "log_writer": get_log_writer().stats()
+        }
+
 _search_service = None
 
 def get_search_service() -> SearchService:
     global _search_service
     if _search_service is None:
         _search_service = SearchService()
-    return _search_service
\ No newline at end of file
+    return _search_service
+
+def shutdown_search_service():
+    """Stop the search executors (no-op if the service was never created)"""
+    if _search_service is not None:
+        _search_service.vector_executor.shutdown(wait=False)
+        _search_service.db_executor.shutdown(wait=False)
+        _search_service.fan_out_executor.shutdown(wait=False)
\ No newline at end of file
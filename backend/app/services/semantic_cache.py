@@ -0,0 +1,205 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows allocated when a variant is first written; doubled as it fills up
+_INITIAL_ROWS = 8
+
+class _Slot:
+    """
+    Ring buffer of normalized query embeddings and their vector-search
+    candidates. Rows are allocated on demand, up to `capacity`.
+    """
+    
+    def __init__(self, capacity: int, dimension: int):
+        self.capacity = capacity
+        self.matrix = np.zeros((0, dimension), dtype=np.float32)
+        self.stored_at = np.zeros(0)
+        self.payloads: List[Optional[List[Dict]]] = []
+        self.size = 0
+        self.next = 0
+    
+    @property
+    def rows(self) -> int:
+        """Allocated rows"""
+        return self.matrix.shape[0]
+    
+    def _grow(self):
+        rows = min(self.capacity, max(_INITIAL_ROWS, self.rows * 2))
+        matrix = np.zeros((rows, self.matrix.shape[1]), dtype=np.float32)
+        matrix[:self.rows] = self.matrix
+        stored_at = np.full(rows, -np.inf)
+        stored_at[:self.rows] = self.stored_at
+        self.payloads.extend([None] * (rows - self.rows))
+        self.matrix = matrix
+        self.stored_at = stored_at
+    
+    def write(self, query: np.ndarray, payload: List[Dict], now: float):
+        """Store a row, appending until full, then replacing the oldest"""
+        if self.size < self.capacity:
+            if self.size == self.rows:
+                self._grow()
+            row = self.size
+            self.size += 1
+        else:
+            row = self.next
+            self.next = (row + 1) % self.capacity
+        self.matrix[row] = query
+        self.stored_at[row] = now
+        self.payloads[row] = payload
+    
+    def expire(self, cutoff: float):
+        """Free the candidates of rows stored before cutoff"""
+        for row in np.flatnonzero((self.stored_at < cutoff) & (self.stored_at > -np.inf)):
+            self.payloads[row] = None
+            self.stored_at[row] = -np.inf
+
+class SemanticQueryCache:
+    """
+    Reuses vector-search candidates across paraphrased queries. Recent query
+    embeddings are kept per company (and per filter/size variant) as rows of
+    a float32 matrix; a new query whose cosine similarity with a stored row
+    reaches `threshold` gets that row's candidates without querying Chroma.
+    A company's entries are dropped when its index generation changes.
+    
+    Memory is bounded: a company keeps its `variants_per_company` most
+    recently used variants, and once `max_entries` rows are allocated in
+    total, the least recently used variants are evicted.
+    """
+    
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        entries_per_variant: int = 256,
+        ttl_seconds: int = 600,
+        max_companies: int = 1000,
+        variants_per_company: int = 16,
+        max_entries: int = 20000
+    ):
+        self.threshold = threshold
+        self.entries_per_variant = entries_per_variant
+        self.ttl_seconds = ttl_seconds
+        self.max_companies = max_companies
+        self.variants_per_company = variants_per_company
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._rows = 0
+        self._companies = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _normalize(embedding: List[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0:
+            return None
+        return vector / norm
+    
+    def _drop_company(self, company_id: int):
+        """Forget a company's variants (lock held)"""
+        entry = self._companies.pop(company_id, None)
+        if entry is not None:
+            self._rows -= sum(slot.rows for slot in entry["variants"].values())
+    
+    def _company(self, company_id: int, generation: int) -> OrderedDict:
+        """A company's variants, reset when its corpus changed (lock held)"""
+        entry = self._companies.get(company_id)
+        if entry is None or entry["generation"] != generation:
+            self._drop_company(company_id)
+            entry = {"generation": generation, "variants": OrderedDict()}
+            self._companies[company_id] = entry
+            while len(self._companies) > self.max_companies:
+                self._drop_company(next(iter(self._companies)))
+        self._companies.move_to_end(company_id)
+        return entry["variants"]
+    
+    def _evict(self, variants: OrderedDict):
+        """Drop least recently used variants past the limits (lock held)"""
+        while len(variants) > self.variants_per_company:
+            _, slot = variants.popitem(last=False)
+            self._rows -= slot.rows
+            self.evictions += 1
+        while self._rows > self.max_entries and self._companies:
+            company_id, entry = next(iter(self._companies.items()))
+            oldest = entry["variants"]
+            if oldest is variants and len(variants) <= 1:
+                # Only the variant being written is left
+                break
+            if oldest:
+                _, slot = oldest.popitem(last=False)
+                self._rows -= slot.rows
+                self.evictions += 1
+            if not oldest:
+                self._companies.pop(company_id)
+    
+    def get(self, company_id: int, generation: int, variant: Hashable, embedding: List[float]) -> Optional[List[Dict]]:
+        """Candidates of the most similar cached query, if similar enough"""
+        query = self._normalize(embedding)
+        if query is None:
+            return None
+        
+        with self._lock:
+            variants = self._company(company_id, generation)
+            slot = variants.get(variant)
+            if slot is None or slot.size == 0 or slot.matrix.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+            variants.move_to_end(variant)
+            # Rows never written or past their TTL cannot match
+            slot.expire(time.monotonic() - self.ttl_seconds)
+            similarities = slot.matrix @ query
+            similarities[slot.stored_at == -np.inf] = -1.0
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return [dict(candidate) for candidate in slot.payloads[best]]
+    
+    def set(self, company_id: int, generation: int, variant: Hashable, embedding: List[float], candidates: List[Dict]):
+        """Remember a query's candidates, replacing the oldest entry when full"""
+        query = self._normalize(embedding)
+        if query is None:
+            return
+        
+        with self._lock:
+            now = time.monotonic()
+            variants = self._company(company_id, generation)
+            slot = variants.get(variant)
+            if slot is not None and slot.matrix.shape[1] != query.shape[0]:
+                self._rows -= slot.rows
+                slot = None
+            if slot is None:
+                slot = variants[variant] = _Slot(self.entries_per_variant, query.shape[0])
+            variants.move_to_end(variant)
+            slot.expire(now - self.ttl_seconds)
+            rows = slot.rows
+            slot.write(query, [dict(candidate) for candidate in candidates], now)
+            self._rows += slot.rows - rows
+            self._evict(variants)
+    
+    def invalidate(self, company_id: int):
+        """Drop every entry of a company"""
+        with self._lock:
+            self._drop_company(company_id)
+    
+    def stats(self) -> Dict:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "companies": len(self._companies),
+            "entries": self._rows,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
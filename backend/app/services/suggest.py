@@ -0,0 +1,275 @@
+import bisect
+import heapq
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import CaseInstance, Document, SearchHistory
+
+logger = logging.getLogger(__name__)
+
+# Ranking weight of one occurrence per source; a query's weight grows with its use
+SOURCE_WEIGHTS = {"query": 1.0, "document": 3.0, "case": 3.0}
+# Completions also match from the start of a later word ("pol" -> "vacation policy")
+MAX_WORD_STARTS = 4
+# Results of prefixes this short span large key ranges and are memoized
+MEMO_PREFIX_LENGTH = 3
+
+WORD_SPLIT = re.compile(r"[\s_\-.]+")
+
+def normalize(text: str) -> str:
+    """Lowercase, collapse separators to single spaces"""
+    return " ".join(WORD_SPLIT.split(text.lower())).strip()
+
+def strip_extension(filename: str) -> str:
+    """Filename without its extension"""
+    return filename.rsplit(".", 1)[0] if "." in filename else filename
+
+class CompanySuggestions:
+    """
+    Prefix index of one company: entries keyed by (kind, ref) plus a sorted
+    array of (key, entry) pairs searched with bisect. Keys of new entries are
+    merged in by the writer, so lookups never sort. Keys of removed entries
+    stay until the next rebuild and are skipped at lookup. Short prefixes are
+    memoized until the index changes.
+    """
+    
+    def __init__(self):
+        self.entries: Dict[Tuple, Dict] = {}
+        self.keys: List[Tuple[str, Tuple]] = []
+        self.pending: List[Tuple[str, Tuple]] = []
+        self.memo: Dict[Tuple, List[Dict]] = {}
+        self.history_id = 0
+        self.document_id = 0
+        self.case_id = 0
+        self.built_at = time.monotonic()
+        self.refreshed_at = self.built_at
+        self.lock = threading.Lock()
+    
+    def add(self, kind: str, ref, text: str, weight: float):
+        """Add weight to an entry, creating it if needed (lock held)"""
+        self.memo.clear()
+        key = (kind, ref)
+        entry = self.entries.get(key)
+        if entry is None:
+            norm = normalize(strip_extension(text) if kind == "document" else text)
+            if not norm:
+                return
+            self.entries[key] = {"text": text, "norm": norm, "kind": kind, "ref": ref, "weight": weight}
+            words = norm.split(" ")
+            for start in range(min(len(words), MAX_WORD_STARTS)):
+                self.pending.append((" ".join(words[start:]), key))
+        else:
+            entry["weight"] += weight
+    
+    def remove(self, kind: str, ref):
+        """Drop an entry (lock held)"""
+        self.memo.clear()
+        self.entries.pop((kind, ref), None)
+    
+    def merge_pending(self):
+        """Merge keys of new entries into the sorted array (lock held)"""
+        if not self.pending:
+            return
+        if len(self.pending) > len(self.keys) // 10:
+            # Bulk load: one sort beats many insertions
+            self.keys = sorted(self.keys + self.pending)
+        else:
+            # In place: lookups take the same lock
+            for item in self.pending:
+                bisect.insort(self.keys, item)
+        self.pending = []
+    
+    def lookup(self, prefix: str, limit: int, min_query_count: int, scan_limit: int) -> List[Dict]:
+        """Best completions of a normalized prefix"""
+        with self.lock:
+            memo_key = (prefix, limit, min_query_count)
+            if memo_key in self.memo:
+                return [dict(entry) for entry in self.memo[memo_key]]
+            
+            keys = self.keys
+            entries = self.entries
+            lo = bisect.bisect_left(keys, (prefix,))
+            hi = bisect.bisect_left(keys, (prefix + "\uffff",), lo)
+            
+            scored = {}
+            for key, entry_key in keys[lo:min(hi, lo + scan_limit)]:
+                entry = entries.get(entry_key)
+                # Removed, or renamed since this key was indexed
+                if entry is None or not entry["norm"].endswith(key):
+                    continue
+                if entry["kind"] == "query" and entry["weight"] < min_query_count:
+                    continue
+                # Prefer matches at the very beginning, then heavier, then shorter
+                score = (entry["norm"].startswith(prefix), entry["weight"], -len(entry["text"]))
+                if entry_key not in scored or scored[entry_key][0] < score:
+                    scored[entry_key] = (score, entry)
+            
+            best = [entry for _, entry in heapq.nlargest(limit, scored.values(), key=lambda item: item[0])]
+            if len(prefix) < MEMO_PREFIX_LENGTH:
+                self.memo[memo_key] = best
+            return [dict(entry) for entry in best]
+
+class SuggestionService:
+    """
+    Search-as-you-type completions per company, served from memory. Indexes
+    frequent SearchHistory queries, document filenames and case titles.
+    New rows are pulled incrementally (by id watermark) in the background;
+    uploads and edits are pushed directly; a periodic full rebuild
+    reconciles deletions made by other processes.
+    """
+    
+    def __init__(self):
+        self._companies: Dict[int, CompanySuggestions] = {}
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="suggest")
+    
+    def _load(self, db: Session, index: CompanySuggestions, company_id: int):
+        """Pull rows newer than the index watermarks"""
+        history_query = db.query(
+            func.max(SearchHistory.id),
+            func.min(SearchHistory.query_text),
+            func.count(SearchHistory.id)
+        ).filter(
+            SearchHistory.company_id == company_id,
+            SearchHistory.id > index.history_id
+        )
+        if index.history_id == 0:
+            cutoff = datetime.utcnow() - timedelta(days=settings.SUGGEST_HISTORY_DAYS)
+            history_query = history_query.filter(SearchHistory.timestamp >= cutoff)
+        history = history_query.group_by(func.lower(SearchHistory.query_text)).all()
+        
+        documents = db.query(Document.id, Document.filename).filter(
+            Document.company_id == company_id,
+            Document.id > index.document_id
+        ).all()
+        
+        cases = db.query(CaseInstance.id, CaseInstance.data_json).filter(
+            CaseInstance.company_id == company_id,
+            CaseInstance.id > index.case_id
+        ).all()
+        
+        with index.lock:
+            for max_id, text, count in history:
+                if len(text) <= settings.SUGGEST_MAX_QUERY_LENGTH:
+                    index.add("query", normalize(text), text, SOURCE_WEIGHTS["query"] * count)
+                index.history_id = max(index.history_id, max_id)
+            # Documents and cases may already have been pushed by upsert()
+            for doc_id, filename in documents:
+                if ("document", doc_id) not in index.entries:
+                    index.add("document", doc_id, filename, SOURCE_WEIGHTS["document"])
+                index.document_id = max(index.document_id, doc_id)
+            for case_id, data_json in cases:
+                title = (data_json or {}).get("title")
+                if title and ("case", case_id) not in index.entries:
+                    index.add("case", case_id, title, SOURCE_WEIGHTS["case"])
+                index.case_id = max(index.case_id, case_id)
+            index.merge_pending()
+            index.refreshed_at = time.monotonic()
+    
+    def _build(self, db: Session, company_id: int) -> CompanySuggestions:
+        index = CompanySuggestions()
+        self._load(db, index, company_id)
+        with self._lock:
+            self._companies[company_id] = index
+        logger.info(f"Built suggestion index for company {company_id}: {len(index.entries)} entries")
+        return index
+    
+    def _refresh(self, company_id: int, rebuild: bool):
+        db = SessionLocal()
+        try:
+            if rebuild:
+                self._build(db, company_id)
+            else:
+                index = self._companies.get(company_id)
+                if index is not None:
+                    self._load(db, index, company_id)
+        except Exception as e:
+            logger.error(f"Suggestion index refresh failed for company {company_id}: {e}")
+        finally:
+            db.close()
+            with self._lock:
+                self._refreshing.discard(company_id)
+    
+    def _schedule_refresh(self, company_id: int, index: CompanySuggestions):
+        now = time.monotonic()
+        rebuild = now - index.built_at > settings.SUGGEST_REBUILD_SECONDS
+        if not rebuild and now - index.refreshed_at < settings.SUGGEST_REFRESH_SECONDS:
+            return
+        with self._lock:
+            if company_id in self._refreshing:
+                return
+            self._refreshing.add(company_id)
+        self._executor.submit(self._refresh, company_id, rebuild)
+    
+    def suggest(self, db: Session, company_id: int, prefix: str, limit: int = 8) -> List[Dict]:
+        """
+        Completions for a typed prefix. Only the first call for a company
+        touches the database; later refreshes run in the background.
+        """
+        normalized = normalize(prefix)
+        if len(normalized) < settings.SUGGEST_MIN_PREFIX_LENGTH:
+            return []
+        
+        index = self._companies.get(company_id)
+        if index is None:
+            index = self._build(db, company_id)
+        else:
+            self._schedule_refresh(company_id, index)
+        
+        return [
+            {
+                "text": entry["text"],
+                "kind": entry["kind"],
+                "document_id": entry["ref"] if entry["kind"] == "document" else None,
+                "case_id": entry["ref"] if entry["kind"] == "case" else None
+            }
+            for entry in index.lookup(
+                normalized, limit,
+                min_query_count=settings.SUGGEST_MIN_QUERY_COUNT,
+                scan_limit=settings.SUGGEST_SCAN_LIMIT
+            )
+        ]
+    
+    def upsert(self, company_id: int, kind: str, ref: int, text: str):
+        """Index a new or renamed document/case right away (no-op until the company is indexed)"""
+        index = self._companies.get(company_id)
+        if index is None:
+            return
+        with index.lock:
+            index.remove(kind, ref)
+            index.add(kind, ref, text, SOURCE_WEIGHTS[kind])
+            index.merge_pending()
+    
+    def remove(self, company_id: int, kind: str, ref: int):
+        """Forget a deleted document/case"""
+        index = self._companies.get(company_id)
+        if index is None:
+            return
+        with index.lock:
+            index.remove(kind, ref)
+    
+    def stats(self) -> Dict:
+        """Get index statistics"""
+        return {
+            "companies": len(self._companies),
+            "entries": sum(len(index.entries) for index in list(self._companies.values()))
+        }
+
+# Singleton instance
+_suggestion_service = None
+
+def get_suggestion_service() -> SuggestionService:
+    """Get suggestion service instance"""
+    global _suggestion_service
+    if _suggestion_service is None:
+        _suggestion_service = SuggestionService()
+    return _suggestion_service
@@ -1,48 +1,140 @@
+import calendar
 import chromadb
+import threading
+from datetime import datetime
 from typing import List, Dict, Optional
 import logging
 from app.core.config import settings
+from app.utils.storage import get_file_type
 
 logger = logging.getLogger(__name__)
 
+# Single shared collection used before per-company sharding
+LEGACY_COLLECTION_NAME = "documents"
+COMPANY_COLLECTION_PREFIX = "company_"
+
+def to_epoch(value: datetime) -> int:
+    """Seconds since epoch; naive datetimes are treated as UTC like the rest of the app"""
+    return calendar.timegm(value.utctimetuple())
+
+def build_chunk_metadata(document, chunk_index: int) -> Dict:
+    """Metadata stored with every chunk; filterable fields are pushed into Chroma queries"""
+    return {
+        "document_id": document.id,
+        "company_id": document.company_id,
+        "chunk_index": chunk_index,
+        "filename": document.filename,
+        "file_type": document.file_type or get_file_type(document.filename),
+        "created_at": to_epoch(document.created_at or datetime.utcnow())
+    }
+
+def build_where(
+    file_type: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> Optional[Dict]:
+    """Translate search filters into a Chroma where clause"""
+    conditions = []
+    if file_type:
+        conditions.append({"file_type": file_type.lower().lstrip('.')})
+    if date_from:
+        conditions.append({"created_at": {"$gte": to_epoch(date_from)}})
+    if date_to:
+        conditions.append({"created_at": {"$lte": to_epoch(date_to)}})
+    
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
 class VectorDatabase:
-    """Chroma vector database for storing document embeddings"""
+    """Chroma vector database for storing document embeddings, one collection per company"""
     
     def __init__(self, persist_directory: str = None):
         if persist_directory is None:
             persist_directory = settings.CHROMA_PATH
         
+        self._collections = {}
+        self._lock = threading.Lock()
+        
         try:
-            # Use simpler settings for Chroma
-            self.client = chromadb.PersistentClient(path=persist_directory)
-            
-            # Get or create collection
-            self.collection = self.client.get_or_create_collection(
-                name="documents",
-                metadata={"hnsw:space": "cosine"}
-            )
-            
-            logger.info(f"Vector DB initialized at {persist_directory}")
+            if settings.CHROMA_HOST:
+                # One server owns the index, so every API and worker process
+                # sees the others' writes
+                self.client = chromadb.HttpClient(host=settings.CHROMA_HOST, port=settings.CHROMA_PORT)
+                logger.info(f"Vector DB connected to {settings.CHROMA_HOST}:{settings.CHROMA_PORT}")
+            else:
+                # Local mode keeps the HNSW index in this process's memory:
+                # single process only
+                self.client = chromadb.PersistentClient(path=persist_directory)
+                logger.info(f"Vector DB initialized at {persist_directory}")
         except Exception as e:
             logger.error(f"Error initializing Vector DB: {e}")
             raise
     
+    @staticmethod
+    def collection_name(company_id: int) -> str:
+        """Name of the collection holding a company's chunks"""
+        return f"{COMPANY_COLLECTION_PREFIX}{company_id}"
+    
+    def get_collection(self, company_id: int):
+        """Get or create the collection for a company"""
+        collection = self._collections.get(company_id)
+        if collection is None:
+            with self._lock:
+                collection = self._collections.get(company_id)
+                if collection is None:
+                    collection = self.client.get_or_create_collection(
+                        name=self.collection_name(company_id),
+                        metadata={"hnsw:space": "cosine"}
+                    )
+                    self._collections[company_id] = collection
+        return collection
+    
+    def find_collection(self, company_id: int):
+        """Get the collection for a company, or None if it has none (never creates)"""
+        collection = self._collections.get(company_id)
+        if collection is not None:
+            return collection
+        try:
+            collection = self.client.get_collection(name=self.collection_name(company_id))
+        except Exception as e:
+            # ValueError locally; the HTTP client re-raises the server's message
+            if "does not exist" not in str(e):
+                raise
+            return None
+        with self._lock:
+            return self._collections.setdefault(company_id, collection)
+    
+    def list_company_ids(self) -> List[int]:
+        """Companies that have a collection"""
+        company_ids = []
+        for collection in self.client.list_collections():
+            name = collection.name
+            if name.startswith(COMPANY_COLLECTION_PREFIX):
+                suffix = name[len(COMPANY_COLLECTION_PREFIX):]
+                if suffix.isdigit():
+                    company_ids.append(int(suffix))
+        return sorted(company_ids)
+    
     def add_chunks(
         self,
+        company_id: int,
         chunk_ids: List[str],
         embeddings: List[List[float]],
         texts: List[str],
         metadatas: List[Dict]
     ) -> bool:
-        """Add document chunks to vector database"""
+        """Add document chunks to the company's collection (replacing chunks with the same ids)"""
         try:
-            self.collection.add(
+            self.get_collection(company_id).upsert(
                 ids=chunk_ids,
                 embeddings=embeddings,
                 documents=texts,
                 metadatas=metadatas
             )
-            logger.info(f"Added {len(chunk_ids)} chunks to vector DB")
+            logger.info(f"Added {len(chunk_ids)} chunks to vector DB for company {company_id}")
             return True
         except Exception as e:
             logger.error(f"Error adding chunks to vector DB: {e}")
@@ -51,14 +143,21 @@ class VectorDatabase:
     def search(
         self,
         query_embedding: List[float],
+        company_id: int,
         n_results: int = 5,
         where: Optional[Dict] = None
     ) -> Dict:
-        """Search for similar chunks"""
+        """Search for similar chunks within a company's collection"""
         try:
-            results = self.collection.query(
+            # Reads never create collections (company ids may come from a request)
+            collection = self.find_collection(company_id)
+            # Chroma raises if asked for more results than the collection holds
+            count = collection.count() if collection is not None else 0
+            if count == 0:
+                return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+            results = collection.query(
                 query_embeddings=[query_embedding],
-                n_results=n_results,
+                n_results=min(n_results, count),
                 where=where
             )
             return results
@@ -66,15 +165,27 @@ class VectorDatabase:
             logger.error(f"Error searching vector DB: {e}")
             return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
     
-    def delete_by_document(self, document_id: int) -> bool:
+    def get_embeddings(self, company_id: int, chunk_ids: List[str]) -> Dict[str, List[float]]:
+        """Stored embeddings of the given chunks; unknown ids are omitted"""
+        if not chunk_ids:
+            return {}
+        try:
+            results = self.get_collection(company_id).get(ids=chunk_ids, include=["embeddings"])
+            return dict(zip(results["ids"], results["embeddings"]))
+        except Exception as e:
+            logger.error(f"Error fetching chunk embeddings: {e}")
+            return {}
+    
+    def delete_by_document(self, document_id: int, company_id: int) -> bool:
         """Delete all chunks for a document"""
         try:
-            results = self.collection.get(
+            collection = self.get_collection(company_id)
+            results = collection.get(
                 where={"document_id": document_id}
             )
             
             if results['ids']:
-                self.collection.delete(ids=results['ids'])
+                collection.delete(ids=results['ids'])
                 logger.info(f"Deleted {len(results['ids'])} chunks for document {document_id}")
             
             return True
@@ -82,13 +193,94 @@ class VectorDatabase:
             logger.error(f"Error deleting document chunks: {e}")
             return False
     
-    def get_stats(self) -> Dict:
-        """Get database statistics"""
+    def delete_chunks(self, company_id: int, chunk_ids: List[str]) -> bool:
+        """Delete chunks by id"""
+        if not chunk_ids:
+            return True
+        try:
+            self.get_collection(company_id).delete(ids=chunk_ids)
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting chunks: {e}")
+            return False
+    
+    def update_metadatas(self, company_id: int, chunk_ids: List[str], metadatas: List[Dict]) -> bool:
+        """Replace metadata of existing chunks"""
+        try:
+            self.get_collection(company_id).update(ids=chunk_ids, metadatas=metadatas)
+            return True
+        except Exception as e:
+            logger.error(f"Error updating chunk metadata: {e}")
+            return False
+    
+    def split_legacy_collection(self, batch_size: int = 500, delete_legacy: bool = False) -> Dict[int, int]:
+        """
+        Copy chunks from the legacy shared collection into per-company
+        collections, routed by each chunk's company_id metadata.
+        Upserts, so it is safe to re-run. Returns chunks copied per company.
+        """
+        try:
+            legacy = self.client.get_collection(name=LEGACY_COLLECTION_NAME)
+        except Exception:
+            logger.info("No legacy collection to migrate")
+            return {}
+        
+        copied = {}
+        skipped = 0
+        offset = 0
+        while True:
+            batch = legacy.get(
+                limit=batch_size,
+                offset=offset,
+                include=["embeddings", "documents", "metadatas"]
+            )
+            ids = batch["ids"]
+            if not ids:
+                break
+            
+            grouped = {}
+            for i, chunk_id in enumerate(ids):
+                metadata = batch["metadatas"][i] or {}
+                company_id = metadata.get("company_id")
+                if company_id is None:
+                    skipped += 1
+                    continue
+                group = grouped.setdefault(int(company_id), {"ids": [], "embeddings": [], "documents": [], "metadatas": []})
+                group["ids"].append(chunk_id)
+                group["embeddings"].append(batch["embeddings"][i])
+                group["documents"].append(batch["documents"][i])
+                group["metadatas"].append(metadata)
+            
+            for company_id, group in grouped.items():
+                self.get_collection(company_id).upsert(**group)
+                copied[company_id] = copied.get(company_id, 0) + len(group["ids"])
+            
+            offset += len(ids)
+            logger.info(f"Migrated {offset} legacy chunks")
+        
+        if skipped:
+            logger.warning(f"Skipped {skipped} legacy chunks without company_id")
+        
+        if delete_legacy:
+            self.client.delete_collection(name=LEGACY_COLLECTION_NAME)
+            logger.info("Deleted legacy collection")
+        
+        return copied
+    
+    def get_stats(self, company_id: Optional[int] = None) -> Dict:
+        """Get database statistics for one company or across all companies"""
         try:
-            count = self.collection.count()
+            if company_id is not None:
+                collection = self.get_collection(company_id)
+                return {
+                    "total_chunks": collection.count(),
+                    "collection_name": collection.name
+                }
+            
+            company_ids = self.list_company_ids()
             return {
-                "total_chunks": count,
-                "collection_name": self.collection.name
+                "total_chunks": sum(self.get_collection(cid).count() for cid in company_ids),
+                "collections": len(company_ids)
             }
         except Exception as e:
             logger.error(f"Error getting stats: {e}")
@@ -102,4 +294,4 @@ def get_vector_db() -> VectorDatabase:
     global _vector_db
     if _vector_db is None:
         _vector_db = VectorDatabase()
-    return _vector_db
\ No newline at end of file
+    return _vector_db
@@ -1,8 +1,13 @@
+from collections import OrderedDict
+from concurrent.futures import Future
 from functools import wraps
 from datetime import datetime, timedelta
-from typing import Any, Optional
+from typing import Any, Callable, Dict, Hashable, Optional
+import asyncio
 import hashlib
 import json
+import threading
+import time
 
 class SimpleCache:
     """Simple in-memory cache with TTL"""
@@ -41,6 +46,107 @@ class SimpleCache:
         for k in expired:
             del self._cache[k]
 
+class LRUCache:
+    """Thread-safe in-memory LRU cache with per-entry TTL and hit/miss counters"""
+    
+    def __init__(self, max_size: int = 1000, ttl_seconds: float = 300):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get value if present and not expired, marking it most recently used"""
+        with self._lock:
+            item = self._cache.get(key)
+            if item is not None:
+                value, expires_at = item
+                if time.monotonic() < expires_at:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._cache[key]
+            self.misses += 1
+            return None
+    
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Set value, evicting the least recently used entry when full"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._cache[key] = (value, time.monotonic() + ttl)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+    
+    def delete(self, key: Hashable):
+        """Delete key from cache"""
+        with self._lock:
+            self._cache.pop(key, None)
+    
+    def clear(self):
+        """Clear all cache"""
+        with self._lock:
+            self._cache.clear()
+    
+    def stats(self) -> Dict:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one execution"""
+    
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+    
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """Run func for key, or wait for and share the result of an in-flight call"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        
+        if not leader:
+            return future.result()
+        
+        try:
+            result = func()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+class AsyncSingleFlight:
+    """Coalesce concurrent awaits for the same key into one task (single event loop)"""
+    
+    def __init__(self):
+        self._tasks = {}
+    
+    async def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """Await func() for key, or share the in-flight task for it"""
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        # A cancelled or timed-out waiter must not cancel the shared call
+        return await asyncio.shield(task)
+
 # Global cache instance
 cache = SimpleCache()
 
@@ -1,10 +1,18 @@
 import tiktoken
+import hashlib
 import logging
-from typing import List, Dict
-import uuid
+from typing import List, Dict, Optional
 
 logger = logging.getLogger(__name__)
 
+def make_chunk_id(document_id: int, text: str) -> str:
+    """
+    Vector store id of a chunk, derived from its document and content, so an
+    unchanged chunk keeps its id (and embedding) when the document is reprocessed
+    """
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:24]
+    return f"doc_{document_id}_{digest}"
+
 class TextChunker:
     """Split text into chunks for embedding"""
     
@@ -129,14 +137,15 @@ class TextChunker:
             chunks.append(self._create_chunk(chunk_text, chunk_index, document_id))
         
         logger.info(f"Created {len(chunks)} chunks from document {document_id}")
-        return chunks
+        # Tell repeated chunk texts apart
+        return renumber_chunks(chunks, document_id, 0)
     
     def _create_chunk(self, text: str, index: int, document_id: int) -> Dict:
         """Create chunk dict"""
         return {
             "chunk_text": text,
             "chunk_index": index,
-            "chunk_id": f"doc_{document_id}_chunk_{index}_{uuid.uuid4().hex[:8]}",
+            "chunk_id": make_chunk_id(document_id, text),
             "token_count": self.count_tokens(text),
             "metadata": {
                 "document_id": document_id,
@@ -144,6 +153,28 @@ class TextChunker:
             }
         }
 
+def renumber_chunks(
+    chunks: List[Dict],
+    document_id: int,
+    start_index: int,
+    occurrences: Optional[Dict[str, int]] = None
+) -> List[Dict]:
+    """
+    Shift the indexes of a segment's chunks to follow the previous segments
+    and assign their ids. `occurrences` counts ids already handed out in the
+    document; a repeated text gets an occurrence suffix.
+    """
+    occurrences = {} if occurrences is None else occurrences
+    for offset, chunk in enumerate(chunks):
+        index = start_index + offset
+        chunk["chunk_index"] = index
+        chunk["metadata"]["chunk_index"] = index
+        base_id = make_chunk_id(document_id, chunk["chunk_text"])
+        seen = occurrences.get(base_id, 0)
+        occurrences[base_id] = seen + 1
+        chunk["chunk_id"] = f"{base_id}_{seen}" if seen else base_id
+    return chunks
+
 def chunk_document_text(text: str, document_id: int, chunk_size: int = 800) -> List[Dict]:
     """
     Convenience function to chunk document text
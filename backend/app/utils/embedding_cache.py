@@ -0,0 +1,159 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache backed by SQLite so entries survive
+    restarts. Keys are a hash of (normalized text, model, task_type);
+    least recently used entries are evicted once max_entries is exceeded.
+    """
+    
+    def __init__(self, path: str, max_entries: int = 200000):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, embedding BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logger.info(f"Embedding cache opened at {self.path} ({self._size} entries)")
+    
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize unicode and whitespace so trivially different copies share a key"""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+    
+    @classmethod
+    def make_key(cls, text: str, model: str, task_type: str) -> str:
+        """Build the content-addressed cache key"""
+        data = f"{model}\x00{task_type}\x00{cls.normalize(text)}"
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def _encode(embedding: List[float]) -> bytes:
+        return array("f", embedding).tobytes()
+    
+    @staticmethod
+    def _decode(blob: bytes) -> List[float]:
+        values = array("f")
+        values.frombytes(blob)
+        return values.tolist()
+    
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Look up several keys at once, returns only the keys that were found"""
+        if not keys:
+            return {}
+        
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            try:
+                # Stay well below SQLite's bound-parameter limit
+                for start in range(0, len(unique_keys), 500):
+                    batch = unique_keys[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})",
+                        batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        found[key] = self._decode(blob)
+                
+                if found:
+                    now = time.time()
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                        [(now, key) for key in found]
+                    )
+                    self._conn.commit()
+            except Exception as e:
+                logger.error(f"Embedding cache read failed: {e}")
+                found = {}
+            
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+    
+    def get(self, key: str) -> Optional[List[float]]:
+        """Look up a single key"""
+        return self.get_many([key]).get(key)
+    
+    def set_many(self, items: Dict[str, List[float]]):
+        """Store several embeddings, evicting old entries if the cache is full"""
+        if not items:
+            return
+        
+        now = time.time()
+        with self._lock:
+            try:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, embedding, last_used) VALUES (?, ?, ?)",
+                    [(key, self._encode(embedding), now) for key, embedding in items.items()]
+                )
+                self._size += self._conn.total_changes - before
+                self._conn.commit()
+                
+                if self._size > self.max_entries:
+                    self._evict()
+            except Exception as e:
+                logger.error(f"Embedding cache write failed: {e}")
+    
+    def set(self, key: str, embedding: List[float]):
+        """Store a single embedding"""
+        self.set_many({key: embedding})
+    
+    def _evict(self):
+        """Drop least recently used entries down to 90% of max_entries (lock held)"""
+        target = int(self.max_entries * 0.9)
+        excess = self._size - target
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (excess,)
+        )
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.evictions += excess
+        logger.info(f"Evicted {excess} entries from embedding cache")
+    
+    def stats(self) -> Dict:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+    
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._size = 0
@@ -0,0 +1,123 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Latency buckets in milliseconds
+DEFAULT_MS_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class Histogram:
+    """
+    Thread-safe cumulative histogram, one series per label value,
+    rendered in the Prometheus text exposition format.
+    """
+    
+    def __init__(self, name: str, description: str, label: str, buckets: Tuple[float, ...] = DEFAULT_MS_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, label_value: str, value: float):
+        """Record one observation"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+    
+    def snapshot(self) -> Dict[str, Dict]:
+        """Count, sum and cumulative bucket counts per label value"""
+        with self._lock:
+            result = {}
+            for label_value, series in self._series.items():
+                cumulative = []
+                running = 0
+                for count in series["counts"]:
+                    running += count
+                    cumulative.append(running)
+                result[label_value] = {
+                    "count": series["count"],
+                    "sum": round(series["sum"], 3),
+                    "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], cumulative))
+                }
+            return result
+    
+    def render(self) -> List[str]:
+        """Prometheus text format lines"""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for label_value, series in sorted(self.snapshot().items()):
+            for bound, count in series["buckets"].items():
+                lines.append(f'{self.name}_bucket{{{self.label}="{label_value}",le="{bound}"}} {count}')
+            lines.append(f'{self.name}_sum{{{self.label}="{label_value}"}} {series["sum"]}')
+            lines.append(f'{self.name}_count{{{self.label}="{label_value}"}} {series["count"]}')
+        return lines
+
+class MetricsRegistry:
+    """Named histograms exported together"""
+    
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+    
+    def histogram(self, name: str, description: str, label: str, buckets: Tuple[float, ...] = DEFAULT_MS_BUCKETS) -> Histogram:
+        """Get or create a histogram"""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(name, description, label, buckets)
+            return histogram
+    
+    def render(self) -> str:
+        """All histograms in the Prometheus text format"""
+        lines = []
+        for name in sorted(self._histograms):
+            lines.extend(self._histograms[name].render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+class StageTimer:
+    """
+    Collects per-stage wall-clock timings (ms) and counters for one request.
+    Stages may overlap (e.g. concurrent retrievals); repeated stages add up.
+    """
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+    
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as stage `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+    
+    def add(self, name: str, elapsed_ms: float):
+        """Add elapsed milliseconds to a stage"""
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+    
+    def count(self, name: str, value: Optional[int]):
+        """Record a counter such as a candidate count"""
+        self.counts[name] = value or 0
+    
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the timer was created"""
+        return (time.perf_counter() - self.started) * 1000
+    
+    def to_dict(self) -> Dict:
+        """Rounded timings and counters"""
+        return {
+            "stages_ms": {name: round(ms, 2) for name, ms in self.stages.items()},
+            "counts": dict(self.counts)
+        }
@@ -1,7 +1,7 @@
 import io
 import logging
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
 import pdfplumber
 from docx import Document as DocxDocument
 from pptx import Presentation
@@ -13,19 +13,41 @@ class DocumentParser:
     """Parse different document types and extract text"""
     
     @staticmethod
-    def parse_pdf(file_path: Path) -> str:
-        """Extract text from PDF"""
+    def count_pdf_pages(file_path: Path) -> int:
+        """Number of pages in a PDF (0 if unreadable)"""
+        try:
+            with pdfplumber.open(file_path) as pdf:
+                return len(pdf.pages)
+        except MemoryError:
+            raise
+        except Exception as e:
+            logger.error(f"Error reading PDF {file_path}: {e}")
+            return 0
+    
+    @staticmethod
+    def parse_pdf(file_path: Path, pages: Optional[Tuple[int, int]] = None) -> str:
+        """
+        Extract text from PDF, optionally only pages [start, end) (0-based).
+        Errors in a page range are raised, so they are not taken for blank pages.
+        """
         try:
             text_content = []
             with pdfplumber.open(file_path) as pdf:
-                for page_num, page in enumerate(pdf.pages, 1):
+                start, end = pages if pages else (0, len(pdf.pages))
+                for page_num, page in enumerate(pdf.pages[start:end], start + 1):
                     page_text = page.extract_text()
                     if page_text:
                         text_content.append(f"[Page {page_num}]\n{page_text}")
+                    # Cached layout objects would otherwise pile up for the whole range
+                    page.flush_cache()
             
             return "\n\n".join(text_content)
+        except MemoryError:
+            raise
         except Exception as e:
             logger.error(f"Error parsing PDF {file_path}: {e}")
+            if pages:
+                raise
             return ""
     
     @staticmethod
@@ -44,6 +66,8 @@ class DocumentParser:
             
             all_text = paragraphs + table_text
             return "\n\n".join(all_text)
+        except MemoryError:
+            raise
         except Exception as e:
             logger.error(f"Error parsing DOCX {file_path}: {e}")
             return ""
@@ -65,6 +89,8 @@ class DocumentParser:
                 text_content.append("\n".join(slide_text))
             
             return "\n\n".join(text_content)
+        except MemoryError:
+            raise
         except Exception as e:
             logger.error(f"Error parsing PPTX {file_path}: {e}")
             return ""
@@ -86,6 +112,8 @@ class DocumentParser:
                 text_content.append(sheet_text)
             
             return "\n\n".join(text_content)
+        except MemoryError:
+            raise
         except Exception as e:
             logger.error(f"Error parsing XLSX {file_path}: {e}")
             return ""
@@ -96,14 +124,22 @@ class DocumentParser:
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 return f.read()
+        except MemoryError:
+            raise
         except Exception as e:
             logger.error(f"Error reading TXT {file_path}: {e}")
             return ""
     
+    @staticmethod
+    def is_pdf(file_path: Path, mime_type: str) -> bool:
+        return 'pdf' in mime_type or Path(file_path).suffix.lower() == '.pdf'
+    
     @classmethod
-    def parse_document(cls, file_path: Path, mime_type: str) -> Dict[str, str]:
+    def parse_document(cls, file_path: Path, mime_type: str, pages: Optional[Tuple[int, int]] = None) -> Dict[str, str]:
         """
-        Parse document based on type and return extracted text
+        Parse document based on type and return extracted text.
+        `pages` limits a PDF to a page range; a range that parses without text
+        is not an error, one that fails to parse is.
         Returns: dict with 'text' and 'error' keys
         """
         file_path = Path(file_path)
@@ -115,8 +151,8 @@ class DocumentParser:
             # Determine parser based on mime type or extension
             ext = file_path.suffix.lower()
             
-            if 'pdf' in mime_type or ext == '.pdf':
-                text = cls.parse_pdf(file_path)
+            if cls.is_pdf(file_path, mime_type):
+                text = cls.parse_pdf(file_path, pages)
             elif 'wordprocessing' in mime_type or ext in ['.docx', '.doc']:
                 text = cls.parse_docx(file_path)
             elif 'presentation' in mime_type or ext in ['.pptx', '.ppt']:
@@ -129,10 +165,15 @@ class DocumentParser:
                 return {"text": "", "error": f"Unsupported file type: {mime_type}"}
             
             if not text or not text.strip():
+                if pages:
+                    return {"text": "", "error": None}
                 return {"text": "", "error": "No text could be extracted"}
             
             return {"text": text, "error": None}
             
+        except MemoryError:
+            # The parse pool reports it as a permanent failure
+            raise
         except Exception as e:
             logger.error(f"Error parsing document {file_path}: {e}")
             return {"text": "", "error": str(e)}
\ No newline at end of file
@@ -0,0 +1,114 @@
+import re
+from functools import lru_cache
+from typing import FrozenSet, List, Tuple
+
+# Query words shorter than this are too common to be worth highlighting
+MIN_WORD_LENGTH = 3
+
+# Words of texts and queries
+WORD_PATTERN = re.compile(r"\w+")
+
+@lru_cache(maxsize=1024)
+def query_terms(query: str) -> FrozenSet[str]:
+    """Lowercased query words worth highlighting"""
+    return frozenset(
+        word for word in (m.group().lower() for m in WORD_PATTERN.finditer(query))
+        if len(word) >= MIN_WORD_LENGTH
+    )
+
+def find_matches(text: str, query: str) -> List[Tuple[int, int, str]]:
+    """
+    Case-insensitive (start, end, word) of every query word occurrence, in
+    order. One pass over the text: each word is looked up in the query's
+    term set. Offsets point into the original text (lowercasing can change
+    its length: 'İ'.lower() is two code points).
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+    matches = []
+    for m in WORD_PATTERN.finditer(text):
+        word = m.group().lower()
+        if word in terms:
+            matches.append((m.start(), m.end(), word))
+    return matches
+
+def densest_window(matches: List[Tuple[int, int, str]], max_length: int) -> Tuple[int, int]:
+    """
+    Indices [first, last] of the run of matches fitting in max_length chars
+    with the most distinct words (then most matches). Two pointers, O(matches).
+    """
+    counts = {}
+    best = (0, 0)
+    best_score = (0, 0)
+    left = 0
+    for right, (_, end, word) in enumerate(matches):
+        counts[word] = counts.get(word, 0) + 1
+        while end - matches[left][0] > max_length:
+            left_word = matches[left][2]
+            counts[left_word] -= 1
+            if not counts[left_word]:
+                del counts[left_word]
+            left += 1
+        score = (len(counts), right - left + 1)
+        if score > best_score:
+            best_score = score
+            best = (left, right)
+    return best
+
+def build_snippet(text: str, query: str, max_length: int = 200) -> Tuple[str, List[List[int]]]:
+    """
+    Most relevant snippet of text for the query plus highlight offsets:
+    [start, end) pairs into the returned snippet, one per query word match.
+    """
+    matches = find_matches(text, query)
+    
+    if len(text) <= max_length:
+        return text, [[start, end] for start, end, _ in matches]
+    
+    best_pos = 0
+    if matches:
+        first, last = densest_window(matches, max_length)
+        span_start = matches[first][0]
+        span_end = matches[last][1]
+        # Lead in with some context, but keep the whole run of matches visible
+        slack = max_length - (span_end - span_start)
+        best_pos = max(0, min(span_start - slack // 4, len(text) - max_length))
+        if best_pos > 0:
+            # Start on a word boundary when that does not cut off the first match
+            space = text.find(' ', best_pos, span_start)
+            if space != -1:
+                best_pos = space + 1
+    
+    # Extract snippet
+    snippet = text[best_pos:best_pos + max_length]
+    offset = -best_pos
+    ellipsis = 0
+    
+    # Clean up snippet boundaries
+    if best_pos > 0:
+        stripped = snippet.lstrip()
+        offset += 3 + len(stripped) - len(snippet)
+        snippet = "..." + stripped
+    if best_pos + max_length < len(text):
+        # Try to end at a sentence or word boundary
+        last_period = snippet.rfind('.')
+        last_space = snippet.rfind(' ')
+        if last_period > max_length * 0.7:
+            snippet = snippet[:last_period + 1]
+        elif last_space > max_length * 0.8:
+            snippet = snippet[:last_space] + "..."
+            ellipsis = 3
+        else:
+            snippet = snippet + "..."
+            ellipsis = 3
+    
+    # Keep matches that survived the boundary trimming
+    visible_end = len(snippet) - ellipsis
+    highlights = []
+    for start, end, _ in matches:
+        start += offset
+        end += offset
+        if start >= 0 and end <= visible_end and (best_pos == 0 or start >= 3):
+            highlights.append([start, end])
+    return snippet, highlights
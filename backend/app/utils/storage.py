@@ -100,6 +100,12 @@ def validate_file_type(filename: str, allowed_types: list = None) -> tuple[bool,
     
     return True, mime_types.get(file_ext, 'application/octet-stream')
 
+def get_file_type(filename: str) -> str:
+    """Extract lowercase file type (extension without dot) from filename"""
+    if '.' in filename:
+        return filename.rsplit('.', 1)[1].lower()
+    return 'unknown'
+
 def format_file_size(size_bytes: int) -> str:
     """Format file size to human readable"""
     for unit in ['B', 'KB', 'MB', 'GB']:
@@ -0,0 +1,150 @@
+"""
+Document processing worker. Runs several processes that claim jobs from the
+processing_jobs table, keeping parsing and embedding out of the API process.
+    
+    python -m app.worker --processes 4
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from app.core.config import settings
+
+logger = logging.getLogger("app.worker")
+
+def _configure_logging():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+def _keep_lease(job_id: int, worker_id: str, done: threading.Event):
+    """Renew a job's lease until `done` is set"""
+    from app.core.database import SessionLocal
+    from app.services.job_queue import heartbeat
+    
+    while not done.wait(settings.JOB_HEARTBEAT_SECONDS):
+        db = SessionLocal()
+        try:
+            if not heartbeat(db, job_id, worker_id):
+                logger.warning(f"{worker_id} lost the lease on job {job_id}")
+                return
+        except Exception as e:
+            logger.error(f"Heartbeat for job {job_id} failed: {e}")
+        finally:
+            db.close()
+
+def run_job(job: dict, worker_id: str):
+    """Process one claimed job and record its outcome"""
+    from app.core.database import SessionLocal
+    from app.services.document_processor import get_document_processor
+    from app.services.job_queue import complete_job, fail_job
+    
+    logger.info(f"{worker_id} processing document {job['document_id']} (job {job['id']}, attempt {job['attempts']})")
+    done = threading.Event()
+    keeper = threading.Thread(target=_keep_lease, args=(job["id"], worker_id, done), daemon=True)
+    keeper.start()
+    
+    db = SessionLocal()
+    try:
+        try:
+            result = get_document_processor().process_document(job["document_id"], db)
+        except Exception as e:
+            db.rollback()
+            result = {"success": False, "error": str(e)}
+        finally:
+            done.set()
+            keeper.join()
+        
+        if result.get("success"):
+            complete_job(db, job["id"], worker_id)
+        else:
+            fail_job(db, job["id"], worker_id, result.get("error") or "Unknown error", result.get("retryable", True))
+    except Exception as e:
+        # The lease lapses and another worker retries the job
+        logger.error(f"Could not record the outcome of job {job['id']}: {e}")
+    finally:
+        db.close()
+
+def worker_loop(stop):
+    """Claim and run jobs until `stop` is set"""
+    _configure_logging()
+    # The parent process coordinates shutdown; finish the current job first
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    
+    from app.core.database import SessionLocal
+    from app.services.job_queue import claim_job
+    
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info(f"Worker {worker_id} started")
+    while not stop.is_set():
+        db = SessionLocal()
+        try:
+            job = claim_job(db, worker_id)
+        except Exception as e:
+            logger.error(f"Failed to claim a job: {e}")
+            job = None
+        finally:
+            db.close()
+        
+        if job is None:
+            stop.wait(settings.JOB_POLL_INTERVAL_SECONDS)
+            continue
+        run_job(job, worker_id)
+    
+    from app.services.parse_pool import shutdown_parse_pool
+    shutdown_parse_pool()
+    logger.info(f"Worker {worker_id} stopped")
+
+def main():
+    parser = argparse.ArgumentParser(description="Docent document processing worker")
+    parser.add_argument("--processes", type=int, default=settings.JOB_WORKER_PROCESSES)
+    parser.add_argument("--shutdown-timeout", type=float, default=120.0, help="Seconds to let running jobs finish")
+    args = parser.parse_args()
+    _configure_logging()
+    if not settings.CHROMA_HOST:
+        logger.warning(
+            "CHROMA_HOST is not set: workers write to local Chroma files that a running "
+            "API process will not see until it restarts, and concurrent writers can corrupt them"
+        )
+    
+    # Fresh interpreters: no database connections or client threads inherited
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    
+    def spawn(index: int):
+        process = context.Process(target=worker_loop, args=(stop,), name=f"docent-worker-{index}")
+        process.start()
+        return process
+    
+    def request_stop(signum, frame):
+        logger.info("Stopping workers...")
+        stop.set()
+    
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    
+    processes = [spawn(index) for index in range(max(1, args.processes))]
+    logger.info(f"Started {len(processes)} worker processes")
+    
+    while not stop.wait(5):
+        for index, process in enumerate(processes):
+            if not process.is_alive():
+                # Its job's lease lapses and is reclaimed by a live worker
+                logger.warning(f"{process.name} exited with code {process.exitcode}; restarting")
+                processes[index] = spawn(index)
+    
+    deadline = time.monotonic() + args.shutdown_timeout
+    for process in processes:
+        process.join(timeout=max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            logger.warning(f"{process.name} still busy; terminating")
+            process.terminate()
+
+if __name__ == "__main__":
+    main()
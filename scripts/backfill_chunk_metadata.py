@@ -0,0 +1,79 @@
+"""
+Backfill filterable metadata (file_type, created_at) on vector chunks that
+were indexed before search filters were pushed into the vector query.
+Safe to re-run; chunks that already carry the fields are left alone.
+"""
+import sys
+import argparse
+sys.path.insert(0, '/app')
+
+from app.core.database import SessionLocal
+from app.models.models import Document
+from app.services.vector_db import get_vector_db, build_chunk_metadata
+
+def backfill_company(vector_db, db, company_id: int, batch_size: int) -> int:
+    collection = vector_db.get_collection(company_id)
+    updated = 0
+    offset = 0
+    
+    while True:
+        batch = collection.get(limit=batch_size, offset=offset, include=["metadatas"])
+        ids = batch["ids"]
+        if not ids:
+            break
+        
+        stale = [
+            (chunk_id, metadata or {})
+            for chunk_id, metadata in zip(ids, batch["metadatas"])
+            if not metadata or "file_type" not in metadata or "created_at" not in metadata
+        ]
+        
+        doc_ids = {m.get("document_id") for _, m in stale if m.get("document_id")}
+        documents = {}
+        if doc_ids:
+            documents = {
+                doc.id: doc
+                for doc in db.query(Document).filter(Document.id.in_(doc_ids)).all()
+            }
+        
+        update_ids = []
+        update_metadatas = []
+        for chunk_id, metadata in stale:
+            doc = documents.get(metadata.get("document_id"))
+            if not doc:
+                continue
+            update_ids.append(chunk_id)
+            update_metadatas.append({**metadata, **build_chunk_metadata(doc, metadata.get("chunk_index", 0))})
+        
+        if update_ids and vector_db.update_metadatas(company_id, update_ids, update_metadatas):
+            updated += len(update_ids)
+        
+        offset += len(ids)
+    
+    return updated
+
+def backfill(batch_size: int):
+    vector_db = get_vector_db()
+    db = SessionLocal()
+    
+    try:
+        print("🔄 Backfilling chunk metadata...")
+        total = 0
+        for company_id in vector_db.list_company_ids():
+            updated = backfill_company(vector_db, db, company_id, batch_size)
+            print(f"  company {company_id}: {updated} chunks updated")
+            total += updated
+        print(f"✅ Backfilled {total} chunks")
+    except Exception as e:
+        print(f"❌ Backfill failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    backfill(args.batch_size)
@@ -0,0 +1,94 @@
+"""
+Microbenchmark: single-pass snippet extraction (app.utils.snippets) against
+the previous sliding-window implementation, on synthetic chunks.
+    
+    python scripts/benchmark_snippets.py --chunk-chars 4000 --query-words 6
+"""
+import sys
+import time
+import random
+import argparse
+sys.path.insert(0, '/app')
+
+from app.utils.snippets import build_snippet
+
+def legacy_extract_snippet(text: str, query: str, max_length: int = 200) -> str:
+    """The previous SearchService.extract_snippet, kept for comparison"""
+    if len(text) <= max_length:
+        return text
+    
+    query_words = [w.lower() for w in query.split() if len(w) > 2]
+    text_lower = text.lower()
+    
+    best_pos = 0
+    best_score = 0
+    
+    for i in range(0, len(text) - max_length, 50):
+        window = text_lower[i:i + max_length]
+        score = sum(1 for word in query_words if word in window)
+        if score > best_score:
+            best_score = score
+            best_pos = i
+    
+    snippet = text[best_pos:best_pos + max_length]
+    
+    if best_pos > 0:
+        snippet = "..." + snippet.lstrip()
+    if best_pos + max_length < len(text):
+        last_period = snippet.rfind('.')
+        last_space = snippet.rfind(' ')
+        if last_period > max_length * 0.7:
+            snippet = snippet[:last_period + 1]
+        elif last_space > max_length * 0.8:
+            snippet = snippet[:last_space] + "..."
+        else:
+            snippet = snippet + "..."
+    
+    return snippet
+
+def make_corpus(count: int, chunk_chars: int, vocabulary: list, rng: random.Random) -> list:
+    texts = []
+    for _ in range(count):
+        words = []
+        length = 0
+        while length < chunk_chars:
+            word = rng.choice(vocabulary)
+            words.append(word + ("." if rng.random() < 0.08 else ""))
+            length += len(word) + 1
+        texts.append(" ".join(words))
+    return texts
+
+def bench(func, texts: list, query: str, repeat: int) -> float:
+    """Best-of-repeat milliseconds per call"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            func(text, query)
+        best = min(best, time.perf_counter() - start)
+    return best / len(texts) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark snippet extraction")
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--chunk-chars", type=int, default=3200, help="Roughly one 800-token chunk")
+    parser.add_argument("--query-words", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    vocabulary = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 10))) for _ in range(2000)]
+    texts = make_corpus(args.chunks, args.chunk_chars, vocabulary, rng)
+    query = " ".join(rng.sample(vocabulary, args.query_words))
+    
+    legacy_ms = bench(legacy_extract_snippet, texts, query, args.repeat)
+    current_ms = bench(build_snippet, texts, query, args.repeat)
+    
+    print(f"chunks={args.chunks} chunk_chars={args.chunk_chars} query_words={args.query_words}")
+    print(f"legacy sliding window : {legacy_ms:.4f} ms/snippet")
+    print(f"single pass + offsets : {current_ms:.4f} ms/snippet")
+    print(f"speedup               : {legacy_ms / current_ms:.2f}x")
+
+if __name__ == "__main__":
+    main()
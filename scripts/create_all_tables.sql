@@ -155,3 +155,37 @@ CREATE INDEX IF NOT EXISTS idx_search_history_user ON search_history(user_id);
 CREATE INDEX IF NOT EXISTS idx_search_history_company ON search_history(company_id);
 CREATE INDEX IF NOT EXISTS idx_activity_logs_company ON activity_logs(company_id);
 CREATE INDEX IF NOT EXISTS idx_activity_logs_timestamp ON activity_logs(timestamp);
+
+-- Full-text search over chunks (lexical / hybrid search)
+ALTER TABLE doc_chunks ADD COLUMN IF NOT EXISTS chunk_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', chunk_text)) STORED;
+CREATE INDEX IF NOT EXISTS idx_doc_chunks_tsv ON doc_chunks USING GIN (chunk_tsv);
+
+-- Search cache invalidation
+ALTER TABLE companies ADD COLUMN IF NOT EXISTS index_generation INTEGER NOT NULL DEFAULT 0;
+
+-- Persisted file type for search filters (same rule as utils.storage.get_file_type)
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS file_type VARCHAR
+    GENERATED ALWAYS AS (coalesce(lower(substring(filename from '\.([^.]*)$')), 'unknown')) STORED;
+CREATE INDEX IF NOT EXISTS idx_documents_company_file_type ON documents(company_id, file_type);
+
+-- Durable document processing queue (claimed with FOR UPDATE SKIP LOCKED)
+CREATE TABLE IF NOT EXISTS processing_jobs (
+    id SERIAL PRIMARY KEY,
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    company_id INTEGER NOT NULL REFERENCES companies(id),
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_by VARCHAR(255),
+    lease_expires_at TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_processing_jobs_claim ON processing_jobs(status, run_after);
+-- One queued job per document; a new version may be queued while the previous run is still going
+CREATE UNIQUE INDEX IF NOT EXISTS idx_processing_jobs_queued_document ON processing_jobs(document_id)
+    WHERE status = 'queued';
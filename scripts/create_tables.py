@@ -5,7 +5,7 @@ from app.core.database import engine, Base
 from app.models.models import (
     SystemAdmin, Company, Role, Department, User, 
     Document, DocumentChunk, CaseTemplate, CaseInstance,
-    OnboardingPath, SearchHistory, ActivityLog
+    OnboardingPath, SearchHistory, ActivityLog, ProcessingJob
 )
 
 print("Creating database tables...")
@@ -0,0 +1,39 @@
+"""
+Split the legacy shared "documents" Chroma collection into one collection
+per company. Safe to re-run; pass --delete-legacy once the new collections
+have been verified.
+"""
+import sys
+import argparse
+sys.path.insert(0, '/app')
+
+from app.services.vector_db import get_vector_db
+
+def migrate(batch_size: int, delete_legacy: bool):
+    vector_db = get_vector_db()
+    
+    print("🔄 Splitting legacy vector collection by company...")
+    try:
+        copied = vector_db.split_legacy_collection(batch_size=batch_size, delete_legacy=delete_legacy)
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    
+    if not copied:
+        print("Nothing to migrate")
+        return
+    
+    for company_id, count in sorted(copied.items()):
+        print(f"  company {company_id}: {count} chunks -> {vector_db.collection_name(company_id)}")
+    print(f"✅ Migrated {sum(copied.values())} chunks for {len(copied)} companies")
+    if not delete_legacy:
+        print("Legacy collection kept; re-run with --delete-legacy to remove it")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--delete-legacy", action="store_true")
+    args = parser.parse_args()
+    migrate(args.batch_size, args.delete_legacy)